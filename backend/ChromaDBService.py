@@ -1,17 +1,46 @@
 import chromadb
 import numpy as np
 from typing import List
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
 import os
 from dotenv import load_dotenv
 
+load_dotenv()
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+
+# One HTTP/2 connection pool shared by every async OpenAI client in the
+# process, so concurrent calls multiplex over kept-alive connections.
+_ASYNC_HTTP_CLIENT = DefaultAsyncHttpxClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+)
+
+
+# The SDK default is a 600 s timeout with two retries; a stalled completion
+# should fail fast instead of holding a request for minutes.
+OPENAI_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+OPENAI_MAX_RETRIES = 1
+
+
+async def close_async_http_client() -> None:
+    """Close the shared async HTTP pool; call once when the server shuts down."""
+    await _ASYNC_HTTP_CLIENT.aclose()
+
 
 class ChromaDBService:
     """Handles ChromaDB vector database operations and embeddings."""
 
     def __init__(self):
-        load_dotenv()
-        self.openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        self.openai_client = OpenAI(
+            api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES
+        )
+        self.async_openai_client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=_ASYNC_HTTP_CLIENT,
+            timeout=OPENAI_TIMEOUT,
+            max_retries=OPENAI_MAX_RETRIES,
+        )
         self.chroma_path = "chroma_db"
         self.collection_name = "tlcchatmate"
         self.embedding_model = "text-embedding-3-large"
@@ -35,6 +64,22 @@ class ChromaDBService:
         )
         return response.data[0].embedding
 
+    async def get_embedding_async(self, text: str) -> List[float]:
+        """Get embedding vector for text without blocking the event loop."""
+        response = await self.async_openai_client.embeddings.create(
+            model=self.embedding_model,
+            input=text,
+        )
+        return response.data[0].embedding
+
+    async def get_embeddings_async(self, texts: List[str]) -> List[List[float]]:
+        """Get embedding vectors for several texts in one OpenAI request."""
+        response = await self.async_openai_client.embeddings.create(
+            model=self.embedding_model,
+            input=texts,
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
     @staticmethod
     def calculate_cosine_similarity(vector1: List[float], vector2: List[float]) -> float:
         """Calculate cosine similarity between two vectors."""
@@ -44,15 +89,4 @@ class ChromaDBService:
         norm2 = np.linalg.norm(v2)
         if norm1 == 0 or norm2 == 0:
             return 0.0
-        return float(np.dot(v1, v2) / (norm1 * norm2))
-
-    def is_follow_up_question(self, current_prompt: str, previous_prompt: str,
-                               similarity_threshold: float = 0.7) -> bool:
-        """Check if current prompt is a follow-up to previous prompt."""
-        if not previous_prompt:
-            return False
-        similarity = self.calculate_cosine_similarity(
-            self.get_embedding(current_prompt),
-            self.get_embedding(previous_prompt),
-        )
-        return similarity > similarity_threshold
\ No newline at end of file
+        return float(np.dot(v1, v2) / (norm1 * norm2))
\ No newline at end of file
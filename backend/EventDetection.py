@@ -1,5 +1,8 @@
+import logging
 from typing import Set, Dict, List
 
+logger = logging.getLogger(__name__)
+
 
 class EventDetection:
     """Detects changes (insert, update, delete) in the database since last sync."""
@@ -42,7 +45,7 @@ class EventDetection:
             return current_ids
 
         except Exception as e:
-            print(f"Error getting current document IDs: {e}")
+            logger.error("Error getting current document IDs: %s", e)
             if db:
                 db.close()
             return set()
@@ -83,14 +86,14 @@ class EventDetection:
 
             total = sum(len(v) for v in changes.values())
             if total > 0:
-                print(
-                    f"Changes detected: {len(changes['inserted'])} inserted, "
-                    f"{len(changes['updated'])} updated, {len(changes['deleted'])} deleted"
+                logger.info(
+                    "Changes detected: %d inserted, %d updated, %d deleted",
+                    len(changes['inserted']), len(changes['updated']), len(changes['deleted']),
                 )
             return changes
 
         except Exception as e:
-            print(f"Error detecting changes: {e}")
+            logger.error("Error detecting changes: %s", e)
             return changes
 
     def check_for_updates(self, db, last_sync_time: str) -> bool:
@@ -130,7 +133,7 @@ class EventDetection:
             return bool(deleted_ids)
 
         except Exception as e:
-            print(f"Error checking for updates: {e}")
+            logger.error("Error checking for updates: %s", e)
             return True
 
     @staticmethod
@@ -1,8 +1,10 @@
 import io
 import base64
+import logging
+import multiprocessing
+import queue
 from typing import List, Tuple, Dict
 from datetime import datetime
-from dotenv import load_dotenv
 from dbconnector.db import tlcchatmate
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from ChromaDBService import ChromaDBService
@@ -11,12 +13,18 @@ from WebScraper import WebScraper
 from VersionDetector import VersionDetector
 import pdfplumber
 
+logger = logging.getLogger(__name__)
+
 
 class KnowledgeRepository(ChromaDBService):
     """Handles synchronization between database and ChromaDB with incremental indexing."""
 
-    def __init__(self):
-        load_dotenv()
+    def __init__(self, progress_queue=None):
+        """
+        Args:
+            progress_queue: Optional multiprocessing queue that receives every
+                (step, status) update; set when running in a sync subprocess.
+        """
         super().__init__()
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
@@ -28,10 +36,14 @@ class KnowledgeRepository(ChromaDBService):
         self.web_scraper = WebScraper()
         self.version_detector = VersionDetector()
         self.progress = {"step": None, "status": "idle"}
+        self._progress_queue = progress_queue
 
     def set_progress(self, step: str, status: str = "running"):
-        self.progress["step"] = step
-        self.progress["status"] = status
+        # Swap in a new dict so readers on other threads never see a step from
+        # one update paired with the status of another.
+        self.progress = {"step": step, "status": status}
+        if self._progress_queue is not None:
+            self._progress_queue.put((step, status))
 
     def get_progress(self):
         return self.progress
@@ -52,7 +64,7 @@ class KnowledgeRepository(ChromaDBService):
         try:
             return tlcchatmate()
         except Exception as e:
-            print(f"Database connection failed: {e}")
+            logger.error("Database connection failed: %s", e)
             return None
 
     def decode_pdf_bytes(self, pdf_data) -> bytes:
@@ -146,7 +158,7 @@ class KnowledgeRepository(ChromaDBService):
         try:
             return self._extract_with_pdfplumber(pdf_bytes, document_name)
         except Exception as e:
-            print(f"Error reading PDF for {doc_id}: {e}")
+            logger.error("Error reading PDF for %s: %s", doc_id, e)
             return ""
 
     @staticmethod
@@ -327,7 +339,7 @@ class KnowledgeRepository(ChromaDBService):
                     'already_archived': archive_at is not None,
                 })
         except Exception as e:
-            print(f"Error fetching handbook data: {e}")
+            logger.error("Error fetching handbook data: %s", e)
 
     def _process_course_data(self, conn, documents_data: List[dict]):
         """
@@ -353,7 +365,7 @@ class KnowledgeRepository(ChromaDBService):
                     'already_archived': archive_at is not None,
                 })
         except Exception as e:
-            print(f"Error fetching course data: {e}")
+            logger.error("Error fetching course data: %s", e)
 
     def _process_faq_data(self, conn, documents_data: List[dict]):
         """Extract and store FAQ documents."""
@@ -371,7 +383,7 @@ class KnowledgeRepository(ChromaDBService):
                     'already_archived': False,
                 })
         except Exception as e:
-            print(f"Error fetching FAQ data: {e}")
+            logger.error("Error fetching FAQ data: %s", e)
 
     def _build_archive_status(self, documents_data: List[dict]) -> Dict:
         """
@@ -473,7 +485,7 @@ class KnowledgeRepository(ChromaDBService):
                 db.commit()
 
         except Exception as e:
-            print(f"Error updating archive status: {e}")
+            logger.error("Error updating archive status: %s", e)
             db.rollback()
 
     def collect_all_documents(
@@ -489,7 +501,7 @@ class KnowledgeRepository(ChromaDBService):
             self._process_course_data(conn, documents_data)
             self._process_faq_data(conn, documents_data)
         except Exception as e:
-            print(f"Error collecting documents: {e}")
+            logger.error("Error collecting documents: %s", e)
             raise
 
         archive_status = self._build_archive_status(documents_data)
@@ -505,7 +517,7 @@ class KnowledgeRepository(ChromaDBService):
                     scraped_data, documents, metadata, ids, self.text_splitter
                 )
         except Exception as e:
-            print(f"Error processing website data: {e}")
+            logger.error("Error processing website data: %s", e)
 
         return documents, metadata, ids, archive_status, documents_data
 
@@ -541,7 +553,16 @@ class KnowledgeRepository(ChromaDBService):
                 name=self.collection_name,
                 metadata={"hnsw:space": "cosine"},
             )
-            collection.upsert(documents=documents, metadatas=metadata, ids=ids)
+            # Upsert in the largest batches the client accepts; one call with
+            # every chunk fails once the knowledge base outgrows that limit.
+            batch_size = self.client.get_max_batch_size()
+            for start in range(0, len(documents), batch_size):
+                end = start + batch_size
+                collection.upsert(
+                    documents=documents[start:end],
+                    metadatas=metadata[start:end],
+                    ids=ids[start:end],
+                )
 
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             self.update_sync_time(collection, current_time)
@@ -555,12 +576,46 @@ class KnowledgeRepository(ChromaDBService):
             return True
 
         except Exception as e:
-            print(f"Error during sync: {e}")
+            logger.error("Error during sync: %s", e)
             if db:
                 db.close()
             self.set_progress("Error", "error")
             return False
 
+    def sync_in_subprocess(self) -> bool:
+        """
+        Run sync_data_to_chromadb in a child process so PDF parsing, chunking
+        and embedding do not compete with request handling for this process's
+        GIL. The child sends each progress step back over a queue and this
+        instance mirrors it, so get_progress works unchanged.
+
+        Returns:
+            True if the child's sync ended with status "completed".
+        """
+        # spawn, not fork: the server process runs threads and an event loop.
+        context = multiprocessing.get_context("spawn")
+        progress_queue = context.Queue()
+        process = context.Process(target=_sync_in_child, args=(progress_queue,), daemon=True)
+        process.start()
+        while process.is_alive():
+            try:
+                self.set_progress(*progress_queue.get(timeout=0.5))
+            except queue.Empty:
+                pass
+        process.join()
+        while True:
+            try:
+                self.set_progress(*progress_queue.get_nowait())
+            except queue.Empty:
+                break
+        if process.exitcode != 0:
+            logger.error("Sync process exited with code %s", process.exitcode)
+            self.set_progress("Error", "error")
+
+        # The child seeded its own change detector; reseed ours on next check.
+        self.event_detector.last_processed_ids = set()
+        return self.progress["status"] == "completed"
+
     def check_updates_available(self) -> bool:
         """Check if there are any updates available in the database."""
         db = self.get_db_connection()
@@ -578,7 +633,7 @@ class KnowledgeRepository(ChromaDBService):
 
             return self.event_detector.check_for_updates(db, last_sync_time)
         except Exception as e:
-            print(f"Error checking updates: {e}")
+            logger.error("Error checking updates: %s", e)
             return False
         finally:
             if db:
@@ -588,4 +643,9 @@ class KnowledgeRepository(ChromaDBService):
         """Extract base document ID from chunk ID."""
         if chunk_id.startswith('_sync_'):
             return None
-        return chunk_id.split('_chunk_')[0] if '_chunk_' in chunk_id else chunk_id
\ No newline at end of file
+        return chunk_id.split('_chunk_')[0] if '_chunk_' in chunk_id else chunk_id
+
+
+def _sync_in_child(progress_queue) -> None:
+    """Entry point of the sync subprocess started by sync_in_subprocess."""
+    KnowledgeRepository(progress_queue=progress_queue).sync_data_to_chromadb()
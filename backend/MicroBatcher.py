@@ -0,0 +1,80 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent async calls that arrive within a short window into a
+    single batch call. Items are grouped by key so that only compatible work
+    (e.g. ChromaDB queries sharing one where-filter) is batched together.
+    """
+
+    def __init__(self, batch_fn: Callable[[Hashable, List[Any]], Awaitable[List[Any]]],
+                 window: float = 0.015, max_batch: int = 16):
+        """
+        Args:
+            batch_fn: Coroutine taking (key, items) and returning one result per item,
+                in the same order.
+            window: Seconds to wait for more items after the first one of a batch arrives.
+            max_batch: Batch size that triggers an immediate flush.
+        """
+        self._batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+
+    async def submit(self, item: Any, key: Hashable = None) -> Any:
+        """
+        Queue an item and wait for its result from the next batch call.
+
+        Args:
+            item: The work item passed to batch_fn.
+            key: Items with equal keys share a batch.
+
+        Returns:
+            The result produced by batch_fn for this item.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            loop.call_later(self.window, self._flush, key, batch)
+        batch.append((item, future))
+
+        if len(batch) >= self.max_batch:
+            self._flush(key, batch)
+        return await future
+
+    def _flush(self, key: Hashable, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        """Dispatch a pending batch unless it was already flushed."""
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        asyncio.ensure_future(self._run(key, batch))
+
+    async def _run(self, key: Hashable, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        """
+        Call batch_fn for a flushed batch and resolve every waiting future.
+        A failure, a cancellation, or a result count that does not match the
+        batch is delivered to the waiters as an exception, so no caller is
+        left awaiting forever.
+        """
+        try:
+            results = await self._batch_fn(key, [item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"batch function returned {len(results)} results for {len(batch)} items"
+                )
+        except BaseException as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
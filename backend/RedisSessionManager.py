@@ -0,0 +1,464 @@
+import functools
+import json
+import logging
+import struct
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+import redis
+import redis.asyncio
+from SessionManager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+
+def _redis_call(fallback: bool = True):
+    """
+    Wrap a Redis-backed session method so that a Redis outage fails fast.
+    After a Redis error the store is skipped for REDIS_RETRY_AFTER seconds.
+    Meanwhile, and on the failing call itself, the in-process SessionManager
+    implementation answers instead, or the error is raised if fallback is
+    False.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            if time.monotonic() >= self._redis_down_until:
+                try:
+                    return await method(self, *args, **kwargs)
+                except redis.RedisError as e:
+                    self._redis_down_until = time.monotonic() + self.REDIS_RETRY_AFTER
+                    logger.warning("Redis unavailable, using in-process sessions for %ss: %s",
+                                   self.REDIS_RETRY_AFTER, e)
+                    if not fallback:
+                        raise
+            elif not fallback:
+                raise redis.ConnectionError("Redis is marked unavailable")
+            return await getattr(SessionManager, method.__name__)(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RedisSessionManager(SessionManager):
+    """
+    SessionManager backed by Redis so that every uvicorn worker sees the same
+    sessions. Each session is a hash of scalar fields plus two capped lists
+    (history and cached responses). All three keys expire after session_ttl
+    seconds of inactivity, which takes the place of clear_expired_sessions.
+
+    The client is redis.asyncio on a bounded connection pool with explicit
+    timeouts, so a stalled Redis never blocks the event loop. While Redis is
+    unreachable, sessions fall back to the in-process store.
+    """
+
+    KEY_PREFIX = "vfd:session:"
+    REDIS_RETRY_AFTER = 5
+    SYNC_GENERATION_KEY = "vfd:sync_generation"
+    # scale, stored_at, vector size, scope length; followed by the int8
+    # vector, the UTF-8 scope, and the UTF-8 response.
+    _CACHE_HEADER = struct.Struct("<fdIH")
+    # Resets the history fields of a session only if its meta hash still
+    # exists; a plain HSET would recreate an expired session without a TTL.
+    _RESET_HISTORY_FIELDS = """
+        if redis.call('EXISTS', KEYS[1]) == 0 then
+            return 0
+        end
+        redis.call('HSET', KEYS[1], 'last_assistant', '', 'rewrite_summary', ARGV[1])
+        return 1
+    """
+
+    def __init__(self, url: str, max_history_per_session: int = 4,
+                 max_cached_responses: int = 8, response_cache_ttl: int = 600,
+                 session_ttl: int = 3600, max_connections: int = 32,
+                 socket_timeout: float = 0.5):
+        """
+        Args:
+            url: Redis connection URL, e.g. redis://localhost:6379/0.
+            max_history_per_session: Maximum conversation exchanges to keep per session.
+            max_cached_responses: Maximum answered prompts remembered per session
+                for the semantic response cache.
+            response_cache_ttl: Seconds a cached response stays eligible for reuse.
+            session_ttl: Seconds of inactivity after which Redis drops a session.
+            max_connections: Size of the connection pool shared by all requests.
+            socket_timeout: Seconds to wait for a connection, a free pooled
+                connection, or a reply before treating Redis as unavailable.
+        """
+        super().__init__(max_history_per_session, max_cached_responses, response_cache_ttl)
+        self.session_ttl = session_ttl
+        self._redis_down_until = 0.0
+        pool = redis.asyncio.BlockingConnectionPool.from_url(
+            url,
+            max_connections=max_connections,
+            timeout=socket_timeout,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout,
+        )
+        self._redis = redis.asyncio.Redis(connection_pool=pool)
+        self._reset_history_fields = self._redis.register_script(self._RESET_HISTORY_FIELDS)
+
+    def _keys(self, session_id: str):
+        base = f"{self.KEY_PREFIX}{session_id}"
+        return f"{base}:meta", f"{base}:history", f"{base}:answers"
+
+    def _touch(self, pipe, session_id: str) -> None:
+        """Queue a last_accessed update and TTL refresh for every session key."""
+        meta_key = self._keys(session_id)[0]
+        pipe.hset(meta_key, "last_accessed", datetime.now().isoformat())
+        for key in self._keys(session_id):
+            pipe.expire(key, self.session_ttl)
+
+    @_redis_call()
+    async def create_session(self, session_id: str = None, user_id: str = None) -> str:
+        """
+        Create a new isolated session.
+        Each session_id must be UNIQUE per device/browser.
+
+        Args:
+            session_id: Optional custom session ID; generates UUID if not provided.
+            user_id: Optional user identifier for tracking.
+
+        Returns:
+            The session ID.
+        """
+        if not session_id:
+            session_id = f"session_{uuid.uuid4()}"
+        meta_key, history_key, cache_key = self._keys(session_id)
+        now = datetime.now().isoformat()
+        pipe = self._redis.pipeline()
+        pipe.delete(meta_key, history_key, cache_key)
+        pipe.hset(meta_key, mapping={
+            "user_id": user_id or "",
+            "created_at": now,
+            "last_accessed": now,
+            "last_assistant": "",
+            "rewrite_summary": self.NO_HISTORY_SUMMARY,
+        })
+        pipe.expire(meta_key, self.session_ttl)
+        await pipe.execute()
+        return session_id
+
+    @_redis_call()
+    async def get_session_history(self, session_id: str) -> List[dict]:
+        """
+        Get conversation history for a specific session.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            List of message dicts with 'role' and 'content' keys,
+            or an empty list if the session does not exist.
+        """
+        meta_key, history_key, _ = self._keys(session_id)
+        pipe = self._redis.pipeline()
+        pipe.exists(meta_key)
+        pipe.lrange(history_key, 0, -1)
+        exists, history = await pipe.execute()
+        if not exists:
+            return []
+        pipe = self._redis.pipeline()
+        self._touch(pipe, session_id)
+        await pipe.execute()
+        return [json.loads(message) for message in history]
+
+    @_redis_call()
+    async def add_to_history(self, session_id: str, role: str, content: str) -> bool:
+        """
+        Add a message to a session's history.
+
+        Args:
+            session_id: The session ID.
+            role: 'user' or 'assistant'.
+            content: Message content.
+
+        Returns:
+            True if added successfully, False if session not found.
+        """
+        last_assistant = content if role == 'assistant' else None
+        return await self._append(session_id, [{'role': role, 'content': content}], last_assistant)
+
+    @_redis_call()
+    async def add_exchange(self, session_id: str, prompt: str, response: str) -> bool:
+        """
+        Append a user prompt and the assistant response in one round trip.
+        The history list is trimmed to the newest max_messages entries.
+
+        Args:
+            session_id: The session ID.
+            prompt: The user message.
+            response: The assistant reply.
+
+        Returns:
+            True if added successfully, False if session not found.
+        """
+        messages = [{'role': 'user', 'content': prompt}, {'role': 'assistant', 'content': response}]
+        return await self._append(session_id, messages, response)
+
+    async def _append(self, session_id: str, messages: List[dict],
+                last_assistant: Optional[str]) -> bool:
+        """Push messages, trim the list, and store the refreshed summary."""
+        meta_key, history_key, _ = self._keys(session_id)
+        pipe = self._redis.pipeline()
+        pipe.exists(meta_key)
+        pipe.rpush(history_key, *(json.dumps(message) for message in messages))
+        pipe.ltrim(history_key, -self.max_messages, -1)
+        pipe.lrange(history_key, 0, -1)
+        exists, _, _, history = await pipe.execute()
+        if not exists:
+            await self._redis.delete(history_key)
+            return False
+
+        fields = {'rewrite_summary': self._build_rewrite_summary(
+            json.loads(message) for message in history
+        )}
+        if last_assistant is not None:
+            fields['last_assistant'] = last_assistant
+        pipe = self._redis.pipeline()
+        pipe.hset(meta_key, mapping=fields)
+        self._touch(pipe, session_id)
+        await pipe.execute()
+        return True
+
+    @_redis_call()
+    async def update_history(self, session_id: str, history: List[dict]) -> bool:
+        """
+        Bulk-replace conversation history for a session.
+
+        Args:
+            session_id: The session ID.
+            history: List of message dicts.
+
+        Returns:
+            True if updated successfully, False if session not found.
+        """
+        meta_key, history_key, _ = self._keys(session_id)
+        if not await self._redis.exists(meta_key):
+            return False
+        history = list(history)[-self.max_messages:]
+        last_assistant = next(
+            (m['content'] for m in reversed(history) if m['role'] == 'assistant'), ""
+        )
+        pipe = self._redis.pipeline()
+        pipe.delete(history_key)
+        if history:
+            pipe.rpush(history_key, *(json.dumps(message) for message in history))
+        pipe.hset(meta_key, mapping={
+            'last_assistant': last_assistant,
+            'rewrite_summary': self._build_rewrite_summary(history),
+        })
+        self._touch(pipe, session_id)
+        await pipe.execute()
+        return True
+
+    @_redis_call()
+    async def get_rewrite_summary(self, session_id: str) -> str:
+        """
+        Get the compact history string used by the query rewriter. It is
+        rebuilt whenever the session history changes, not per request.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The summary, or NO_HISTORY_SUMMARY if there is no history.
+        """
+        summary = await self._redis.hget(self._keys(session_id)[0], 'rewrite_summary')
+        return summary.decode('utf-8') if summary else self.NO_HISTORY_SUMMARY
+
+    @_redis_call()
+    async def get_last_assistant(self, session_id: str) -> Optional[str]:
+        """
+        Get the most recent assistant message for a session.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The last assistant message, or None if there is none.
+        """
+        last_assistant = await self._redis.hget(self._keys(session_id)[0], 'last_assistant')
+        return last_assistant.decode('utf-8') if last_assistant else None
+
+    @_redis_call()
+    async def cache_response(self, session_id: str, embedding: List[float], response: str,
+                       scope: str = "") -> bool:
+        """
+        Remember an answered prompt so a near-identical follow-up in the same
+        session can be served without retrieval or an LLM call.
+
+        Args:
+            session_id: The session ID.
+            embedding: Embedding vector of the answered query. This should be
+                the self-contained rewritten query, so that context-dependent
+                prompts such as "how much is it?" do not collide.
+            response: The assistant response that was returned.
+            scope: Only lookups with the same scope (e.g. the reply language)
+                can return this entry.
+
+        Returns:
+            True if cached, False if session not found.
+        """
+        quantized = self._quantize(embedding)
+        if quantized is None:
+            return False
+        vector, scale = quantized
+        scope_bytes = scope.encode('utf-8')
+        # Wall-clock time, since entries are read back by other processes.
+        entry = (
+            self._CACHE_HEADER.pack(scale, time.time(), vector.size, len(scope_bytes))
+            + vector.tobytes()
+            + scope_bytes
+            + response.encode('utf-8')
+        )
+        meta_key, _, cache_key = self._keys(session_id)
+        pipe = self._redis.pipeline()
+        pipe.exists(meta_key)
+        pipe.rpush(cache_key, entry)
+        pipe.ltrim(cache_key, -self.max_cached_responses, -1)
+        pipe.expire(cache_key, self.session_ttl)
+        exists = (await pipe.execute())[0]
+        if not exists:
+            await self._redis.delete(cache_key)
+            return False
+        return True
+
+    @_redis_call()
+    async def find_cached_response(self, session_id: str, embedding: List[float],
+                             threshold: float, scope: str = "") -> Optional[str]:
+        """
+        Return the cached response whose query embedding is most similar to
+        the given embedding, provided the cosine similarity reaches threshold.
+
+        Args:
+            session_id: The session ID.
+            embedding: Embedding vector of the incoming rewritten query.
+            threshold: Minimum cosine similarity for a hit.
+            scope: Only entries cached with this scope are considered.
+
+        Returns:
+            The cached response text, or None on a miss.
+        """
+        quantized = self._quantize(embedding)
+        if quantized is None:
+            return None
+        cutoff = time.time() - self.response_cache_ttl
+        scope_bytes = scope.encode('utf-8')
+        entries = []
+        for raw in await self._redis.lrange(self._keys(session_id)[2], 0, -1):
+            scale, stored_at, size, scope_size = self._CACHE_HEADER.unpack_from(raw)
+            start = self._CACHE_HEADER.size
+            scope_start = start + size
+            response_start = scope_start + scope_size
+            if stored_at < cutoff or raw[scope_start:response_start] != scope_bytes:
+                continue
+            vector = np.frombuffer(raw, dtype=np.int8, count=size, offset=start)
+            response = raw[response_start:].decode('utf-8')
+            entries.append((vector, scale, response, stored_at))
+        return self._best_cached_response(entries, *quantized, threshold)
+
+    @_redis_call()
+    async def clear_all_histories(self) -> int:
+        """
+        Clear conversation history and cached responses for every active
+        session without deleting the sessions themselves. Called after a
+        knowledge-base sync so that stale answers in history can no longer be
+        surfaced by the confirmation, follow-up, or response-cache paths.
+
+        Returns:
+            Number of sessions whose history was cleared.
+        """
+        # Sessions kept in process during a Redis outage are cleared too.
+        count = await super().clear_all_histories()
+        for session_id in await self._scan_sessions():
+            meta_key, history_key, cache_key = self._keys(session_id)
+            pipe = self._redis.pipeline()
+            pipe.llen(history_key)
+            pipe.delete(history_key, cache_key)
+            await self._reset_history_fields(
+                keys=[meta_key], args=[self.NO_HISTORY_SUMMARY], client=pipe
+            )
+            if (await pipe.execute())[0]:
+                count += 1
+        return count
+
+    @_redis_call(fallback=False)
+    async def get_sync_generation(self) -> int:
+        """
+        Return the number of knowledge-base syncs published so far. Every
+        worker reads the same counter, so a sync run by one worker is seen
+        by all of them.
+        """
+        return int(await self._redis.get(self.SYNC_GENERATION_KEY) or 0)
+
+    @_redis_call(fallback=False)
+    async def bump_sync_generation(self) -> int:
+        """
+        Publish a finished sync to every worker sharing this Redis.
+
+        Returns:
+            The new generation.
+        """
+        return int(await self._redis.incr(self.SYNC_GENERATION_KEY))
+
+    @_redis_call()
+    async def session_exists(self, session_id: str) -> bool:
+        """Check if a session exists."""
+        return bool(await self._redis.exists(self._keys(session_id)[0]))
+
+    @_redis_call()
+    async def get_all_sessions(self) -> List[str]:
+        """Get list of all active session IDs."""
+        return await self._scan_sessions()
+
+    async def _scan_sessions(self) -> List[str]:
+        """List the session IDs stored in Redis."""
+        suffix = ":meta"
+        return [
+            key.decode('utf-8')[len(self.KEY_PREFIX):-len(suffix)]
+            async for key in self._redis.scan_iter(match=f"{self.KEY_PREFIX}*{suffix}")
+        ]
+
+    @_redis_call()
+    async def get_session_metadata(self, session_id: str) -> Optional[Dict]:
+        """Get metadata for a session."""
+        meta_key, history_key, _ = self._keys(session_id)
+        pipe = self._redis.pipeline()
+        pipe.hmget(meta_key, 'user_id', 'created_at', 'last_accessed')
+        pipe.llen(history_key)
+        (user_id, created_at, last_accessed), history_length = await pipe.execute()
+        if created_at is None:
+            return None
+        return {
+            'user_id': user_id.decode('utf-8') or None,
+            'created_at': datetime.fromisoformat(created_at.decode('utf-8')),
+            'last_accessed': datetime.fromisoformat(last_accessed.decode('utf-8')),
+            'history_length': history_length,
+        }
+
+    @_redis_call()
+    async def delete_session(self, session_id: str) -> bool:
+        """Delete a session."""
+        meta_key, history_key, cache_key = self._keys(session_id)
+        pipe = self._redis.pipeline()
+        pipe.exists(meta_key)
+        pipe.delete(meta_key, history_key, cache_key)
+        return bool((await pipe.execute())[0])
+
+    async def clear_expired_sessions(self, timeout_seconds: int = 3600) -> int:
+        """
+        Redis expires idle sessions itself after session_ttl seconds, so this
+        only sweeps sessions created in process while Redis was unavailable.
+
+        Args:
+            timeout_seconds: Session inactivity timeout in seconds.
+
+        Returns:
+            Number of in-process sessions deleted.
+        """
+        return await super().clear_expired_sessions(timeout_seconds)
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        await self._redis.aclose()
@@ -0,0 +1,120 @@
+import threading
+import time
+from typing import Dict, Hashable, List, Optional
+import numpy as np
+
+
+class SemanticResponseCache:
+    """
+    Process-wide cache of generated answers keyed by query embedding.
+    A lookup returns the stored answer whose query is most similar to the
+    incoming one, provided the cosine similarity reaches the threshold and
+    both were stored under the same scope (e.g. response language).
+    """
+
+    def __init__(self, max_size: int = 2000, ttl: int = 600):
+        """
+        Args:
+            max_size: Maximum answers kept; the oldest slot is overwritten first.
+            ttl: Seconds a cached answer stays eligible for reuse.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._scope_ids = np.full(max_size, -1, dtype=np.int32)
+        self._stored_at = np.zeros(max_size, dtype=np.float64)
+        self._responses: List[Optional[str]] = [None] * max_size
+        self._scopes: Dict[Hashable, int] = {}
+        self._next = 0
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, embedding: List[float], scope: Hashable, threshold: float) -> Optional[str]:
+        """
+        Return the cached answer for the most similar query in scope.
+
+        Args:
+            embedding: Embedding vector of the incoming query.
+            scope: Only answers stored under an equal scope are considered.
+            threshold: Minimum cosine similarity for a hit.
+
+        Returns:
+            The cached answer, or None on a miss.
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            scope_id = self._scopes.get(scope)
+            if query is None or scope_id is None or self._size == 0:
+                self.misses += 1
+                return None
+            size = self._size
+            scores = self._matrix[:size] @ query
+            eligible = (
+                (self._scope_ids[:size] == scope_id)
+                & (self._stored_at[:size] >= time.monotonic() - self.ttl)
+            )
+            scores[~eligible] = -1.0
+            best = int(scores.argmax())
+            if scores[best] < threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._responses[best]
+
+    def put(self, embedding: List[float], scope: Hashable, response: str) -> bool:
+        """
+        Store an answer for later reuse.
+
+        Args:
+            embedding: Embedding vector of the answered query.
+            scope: Scope the answer may be served in.
+            response: The answer text.
+
+        Returns:
+            True if stored, False for a zero embedding.
+        """
+        vector = self._normalize(embedding)
+        if vector is None:
+            return False
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+            slot = self._next
+            self._matrix[slot] = vector
+            self._scope_ids[slot] = self._scopes.setdefault(scope, len(self._scopes))
+            self._stored_at[slot] = time.monotonic()
+            self._responses[slot] = response
+            self._next = (slot + 1) % self.max_size
+            self._size = max(self._size, slot + 1)
+            return True
+
+    def clear(self) -> None:
+        """Drop every cached answer, e.g. after a knowledge-base sync."""
+        with self._lock:
+            self._scope_ids.fill(-1)
+            self._responses = [None] * self.max_size
+            self._scopes.clear()
+            self._next = 0
+            self._size = 0
+
+    def stats(self) -> Dict:
+        """Return size and hit-rate counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        """Return the embedding as a unit-length float32 vector, or None if it is zero."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
@@ -1,26 +1,39 @@
 import threading
-from typing import Dict, List, Optional
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import uuid
+import numpy as np
 
 
 class SessionManager:
     """
     Manages isolated user sessions with thread-safe conversation history.
-    Prevents context bleeding between users/devices.
+    Prevents context bleeding between users/devices. The public methods are
+    coroutines so that the Redis-backed subclass can share this interface.
     """
 
-    def __init__(self, max_history_per_session: int = 4):
+    NO_HISTORY_SUMMARY = "(no prior conversation)"
+
+    def __init__(self, max_history_per_session: int = 4, max_cached_responses: int = 8,
+                 response_cache_ttl: int = 600):
         """
         Args:
             max_history_per_session: Maximum conversation exchanges to keep per session.
+            max_cached_responses: Maximum answered prompts remembered per session
+                for the semantic response cache.
+            response_cache_ttl: Seconds a cached response stays eligible for reuse.
         """
         self._sessions: Dict[str, Dict] = {}
         self._lock = threading.RLock()
         self.max_history_per_session = max_history_per_session
         self.max_messages = max_history_per_session * 2
+        self.max_cached_responses = max_cached_responses
+        self.response_cache_ttl = response_cache_ttl
+        self._sync_generation = 0
 
-    def create_session(self, session_id: str = None, user_id: str = None) -> str:
+    async def create_session(self, session_id: str = None, user_id: str = None) -> str:
         """
         Create a new isolated session.
         Each session_id must be UNIQUE per device/browser.
@@ -37,15 +50,18 @@ class SessionManager:
 
         with self._lock:
             self._sessions[session_id] = {
-                'history': [],
+                'history': deque(maxlen=self.max_messages),
+                'last_assistant': None,
+                'rewrite_summary': self.NO_HISTORY_SUMMARY,
                 'user_id': user_id,
                 'created_at': datetime.now(),
                 'last_accessed': datetime.now(),
                 'metadata': {},
+                'response_cache': deque(maxlen=self.max_cached_responses),
             }
             return session_id
 
-    def get_session_history(self, session_id: str) -> List[dict]:
+    async def get_session_history(self, session_id: str) -> List[dict]:
         """
         Get conversation history for a specific session.
 
@@ -60,9 +76,9 @@ class SessionManager:
             if session_id not in self._sessions:
                 return []
             self._sessions[session_id]['last_accessed'] = datetime.now()
-            return self._sessions[session_id]['history'].copy()
+            return list(self._sessions[session_id]['history'])
 
-    def add_to_history(self, session_id: str, role: str, content: str) -> bool:
+    async def add_to_history(self, session_id: str, role: str, content: str) -> bool:
         """
         Add a message to a session's history.
 
@@ -80,14 +96,36 @@ class SessionManager:
 
             self._sessions[session_id]['history'].append({'role': role, 'content': content})
             self._sessions[session_id]['last_accessed'] = datetime.now()
+            if role == 'assistant':
+                self._sessions[session_id]['last_assistant'] = content
+            self._refresh_rewrite_summary(self._sessions[session_id])
+            return True
+
+    async def add_exchange(self, session_id: str, prompt: str, response: str) -> bool:
+        """
+        Append a user prompt and the assistant response in one locked step.
+        The bounded history deque drops the oldest messages automatically.
 
-            if len(self._sessions[session_id]['history']) > self.max_messages:
-                self._sessions[session_id]['history'] = (
-                    self._sessions[session_id]['history'][-self.max_messages:]
-                )
+        Args:
+            session_id: The session ID.
+            prompt: The user message.
+            response: The assistant reply.
+
+        Returns:
+            True if added successfully, False if session not found.
+        """
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            session = self._sessions[session_id]
+            session['history'].append({'role': 'user', 'content': prompt})
+            session['history'].append({'role': 'assistant', 'content': response})
+            session['last_assistant'] = response
+            session['last_accessed'] = datetime.now()
+            self._refresh_rewrite_summary(session)
             return True
 
-    def update_history(self, session_id: str, history: List[dict]) -> bool:
+    async def update_history(self, session_id: str, history: List[dict]) -> bool:
         """
         Bulk-replace conversation history for a session.
 
@@ -101,18 +139,168 @@ class SessionManager:
         with self._lock:
             if session_id not in self._sessions:
                 return False
-            self._sessions[session_id]['history'] = (
-                history[-self.max_messages:] if history else []
+            self._sessions[session_id]['history'] = deque(history, maxlen=self.max_messages)
+            self._sessions[session_id]['last_assistant'] = next(
+                (m['content'] for m in reversed(self._sessions[session_id]['history'])
+                 if m['role'] == 'assistant'),
+                None,
             )
             self._sessions[session_id]['last_accessed'] = datetime.now()
+            self._refresh_rewrite_summary(self._sessions[session_id])
+            return True
+
+    async def get_rewrite_summary(self, session_id: str) -> str:
+        """
+        Get the compact history string used by the query rewriter. It is
+        rebuilt whenever the session history changes, not per request.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The summary, or NO_HISTORY_SUMMARY if there is no history.
+        """
+        with self._lock:
+            if session_id not in self._sessions:
+                return self.NO_HISTORY_SUMMARY
+            return self._sessions[session_id]['rewrite_summary']
+
+    def _refresh_rewrite_summary(self, session: Dict) -> None:
+        """Rebuild a session's rewriter summary. Caller must hold the lock."""
+        session['rewrite_summary'] = self._build_rewrite_summary(session['history'])
+
+    @classmethod
+    def _build_rewrite_summary(cls, history) -> str:
+        """
+        Summarise history for the query rewriter: the user messages among the
+        last six entries plus the last assistant message, truncated to 300
+        characters.
+        """
+        lines = []
+        last_assistant = None
+        for msg in list(history)[-6:]:
+            if msg['role'] == 'user':
+                lines.append(f"Student: {msg['content']}")
+            elif msg['role'] == 'assistant':
+                last_assistant = msg['content']
+
+        if last_assistant:
+            truncated = last_assistant[:300] + ("…" if len(last_assistant) > 300 else "")
+            lines.append(f"Assistant: {truncated}")
+
+        return "\n".join(lines) if lines else cls.NO_HISTORY_SUMMARY
+
+    async def get_last_assistant(self, session_id: str) -> Optional[str]:
+        """
+        Get the most recent assistant message for a session in O(1).
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The last assistant message, or None if there is none.
+        """
+        with self._lock:
+            if session_id not in self._sessions:
+                return None
+            return self._sessions[session_id]['last_assistant']
+
+    async def cache_response(self, session_id: str, embedding: List[float], response: str,
+                       scope: str = "") -> bool:
+        """
+        Remember an answered prompt so a near-identical follow-up in the same
+        session can be served without retrieval or an LLM call.
+
+        Args:
+            session_id: The session ID.
+            embedding: Embedding vector of the answered query. This should be
+                the self-contained rewritten query, so that context-dependent
+                prompts such as "how much is it?" do not collide.
+            response: The assistant response that was returned.
+            scope: Only lookups with the same scope (e.g. the reply language)
+                can return this entry.
+
+        Returns:
+            True if cached, False if session not found.
+        """
+        quantized = self._quantize(embedding)
+        if quantized is None:
+            return False
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._sessions[session_id]['response_cache'].append(
+                (*quantized, response, time.monotonic(), scope)
+            )
             return True
 
-    def clear_all_histories(self) -> int:
+    async def find_cached_response(self, session_id: str, embedding: List[float],
+                             threshold: float, scope: str = "") -> Optional[str]:
         """
-        Clear conversation history for every active session without deleting
-        the sessions themselves. Called after a knowledge-base sync so that
-        stale answers in history can no longer be surfaced by the confirmation
-        or follow-up paths.
+        Return the cached response whose query embedding is most similar to
+        the given embedding, provided the cosine similarity reaches threshold.
+
+        Args:
+            session_id: The session ID.
+            embedding: Embedding vector of the incoming rewritten query.
+            threshold: Minimum cosine similarity for a hit.
+            scope: Only entries cached with this scope are considered.
+
+        Returns:
+            The cached response text, or None on a miss.
+        """
+        quantized = self._quantize(embedding)
+        if quantized is None:
+            return None
+        query, query_scale = quantized
+        with self._lock:
+            if session_id not in self._sessions:
+                return None
+            cutoff = time.monotonic() - self.response_cache_ttl
+            entries = [
+                e for e in self._sessions[session_id]['response_cache']
+                if e[3] >= cutoff and e[4] == scope
+            ]
+        return self._best_cached_response(entries, query, query_scale, threshold)
+
+    @staticmethod
+    def _best_cached_response(entries: List[Tuple], query: np.ndarray, query_scale: float,
+                              threshold: float) -> Optional[str]:
+        """
+        Score (int8 vector, scale, response, ...) entries against a quantised
+        query and return the best response at or above threshold.
+        """
+        if not entries:
+            return None
+        matrix = np.stack([e[0] for e in entries]).astype(np.int32)
+        scales = np.array([e[1] for e in entries], dtype=np.float32)
+        scores = (matrix @ query.astype(np.int32)) * scales * query_scale
+        best = int(scores.argmax())
+        return entries[best][2] if scores[best] >= threshold else None
+
+    @staticmethod
+    def _quantize(embedding: List[float]) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        Normalise an embedding and quantise it to int8 with a per-vector scale.
+        The cosine of two vectors is then (a_i8 @ b_i8) * scale_a * scale_b.
+
+        Returns:
+            The int8 vector and its scale, or None for a zero vector.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        vector = vector / norm
+        scale = float(np.abs(vector).max()) / 127.0
+        return np.round(vector / scale).astype(np.int8), scale
+
+    async def clear_all_histories(self) -> int:
+        """
+        Clear conversation history and cached responses for every active
+        session without deleting the sessions themselves. Called after a
+        knowledge-base sync so that stale answers in history can no longer be
+        surfaced by the confirmation, follow-up, or response-cache paths.
 
         Returns:
             Number of sessions whose history was cleared.
@@ -120,22 +308,45 @@ class SessionManager:
         with self._lock:
             count = 0
             for session_data in self._sessions.values():
+                session_data['response_cache'].clear()
+                session_data['last_assistant'] = None
+                session_data['rewrite_summary'] = self.NO_HISTORY_SUMMARY
                 if session_data['history']:
-                    session_data['history'] = []
+                    session_data['history'].clear()
                     count += 1
             return count
 
-    def session_exists(self, session_id: str) -> bool:
+    async def get_sync_generation(self) -> int:
+        """
+        Return the number of knowledge-base syncs published so far. Workers
+        compare it with the generation they last loaded to notice a sync run
+        by another worker.
+        """
+        with self._lock:
+            return self._sync_generation
+
+    async def bump_sync_generation(self) -> int:
+        """
+        Publish a finished sync to every worker sharing this store.
+
+        Returns:
+            The new generation.
+        """
+        with self._lock:
+            self._sync_generation += 1
+            return self._sync_generation
+
+    async def session_exists(self, session_id: str) -> bool:
         """Check if a session exists."""
         with self._lock:
             return session_id in self._sessions
 
-    def get_all_sessions(self) -> List[str]:
+    async def get_all_sessions(self) -> List[str]:
         """Get list of all active session IDs."""
         with self._lock:
             return list(self._sessions.keys())
 
-    def get_session_metadata(self, session_id: str) -> Optional[Dict]:
+    async def get_session_metadata(self, session_id: str) -> Optional[Dict]:
         """Get metadata for a session."""
         with self._lock:
             if session_id not in self._sessions:
@@ -148,7 +359,7 @@ class SessionManager:
                 'history_length': len(session['history']),
             }
 
-    def delete_session(self, session_id: str) -> bool:
+    async def delete_session(self, session_id: str) -> bool:
         """Delete a session."""
         with self._lock:
             if session_id in self._sessions:
@@ -156,7 +367,7 @@ class SessionManager:
                 return True
             return False
 
-    def clear_expired_sessions(self, timeout_seconds: int = 3600) -> int:
+    async def clear_expired_sessions(self, timeout_seconds: int = 3600) -> int:
         """
         Remove sessions inactive for longer than timeout (default 1 hour).
 
@@ -174,4 +385,7 @@ class SessionManager:
             ]
             for session_id in expired:
                 del self._sessions[session_id]
-            return len(expired)
\ No newline at end of file
+            return len(expired)
+
+    async def close(self) -> None:
+        """Release the store's resources. The in-process store holds none."""
\ No newline at end of file
@@ -5,6 +5,17 @@ from datetime import datetime
 
 class VersionDetector:
     """Detects and compares document versions based on revision dates in content."""
+
+    YEAR_RE = re.compile(r'\b(19\d{2}|20\d{2})\b')
+    HISTORICAL_KEYWORDS = (
+        'last year', 'previous', 'old', 'before', 'was', 'were',
+        'history', 'historical', 'past', 'earlier', 'former',
+        'previous version', 'old version', 'archived'
+    )
+    CURRENT_KEYWORDS = (
+        'current', 'now', 'today', 'present', 'latest',
+        'this year', 'new', 'updated', 'recent'
+    )
     
     def __init__(self):
         self.revision_patterns = [
@@ -207,22 +218,11 @@ class VersionDetector:
         """
         query_lower = query.lower()
         
-        year_matches = re.findall(r'\b(19\d{2}|20\d{2})\b', query)
-        specific_year = int(year_matches[0]) if year_matches else None
-        
-        historical_keywords = [
-            'last year', 'previous', 'old', 'before', 'was', 'were',
-            'history', 'historical', 'past', 'earlier', 'former',
-            'previous version', 'old version', 'archived'
-        ]
-        
-        current_keywords = [
-            'current', 'now', 'today', 'present', 'latest',
-            'this year', 'new', 'updated', 'recent'
-        ]
+        year_match = self.YEAR_RE.search(query)
+        specific_year = int(year_match.group(1)) if year_match else None
         
-        has_historical = any(keyword in query_lower for keyword in historical_keywords)
-        has_current = any(keyword in query_lower for keyword in current_keywords)
+        has_historical = any(keyword in query_lower for keyword in self.HISTORICAL_KEYWORDS)
+        has_current = any(keyword in query_lower for keyword in self.CURRENT_KEYWORDS)
         
         if specific_year:
             return {
@@ -1,18 +1,45 @@
+import asyncio
 import json
+import logging
+import re
 import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+import numpy as np
 import uvicorn
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from SessionManager import SessionManager
-from ChromaDBService import ChromaDBService
+from RedisSessionManager import RedisSessionManager
+from ChromaDBService import ChromaDBService, close_async_http_client
 from KnowledgeRepository import KnowledgeRepository
 from VersionDetector import VersionDetector
+from MicroBatcher import MicroBatcher
+from SemanticResponseCache import SemanticResponseCache
 import pytz
 from datetime import datetime
 from openai import OpenAI
 import os
-from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; every worker then syncs on startup.
+    fcntl = None
+
+# Library modules log through logging.getLogger(__name__); LOG_LEVEL (default
+# WARNING) decides what reaches stderr. Arguments are %-formatted lazily, so
+# suppressed messages cost no string building.
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
 
 
 class PromptRequest(BaseModel):
@@ -28,12 +55,72 @@ class PromptResponse(BaseModel):
     intent: Optional[str] = None
 
 
+@dataclass(frozen=True, slots=True)
+class ChromaHits:
+    """
+    One query's ChromaDB results, parsed once. The three sequences are
+    aligned: docs are strings, metas are dicts, dists is a float32 array.
+    metas are empty dicts when the query did not ask for metadata.
+    """
+    docs: List[str]
+    metas: List[dict]
+    dists: np.ndarray
+
+    @classmethod
+    def from_query(cls, result: dict, row: int = 0) -> "ChromaHits":
+        """
+        Parse one row of a raw collection.query() result. Fields left out of
+        include come back as None for the whole result, not per row, so each
+        field is looked up with _row rather than indexed directly.
+        """
+        docs = [doc or "" for doc in cls._row(result, "documents", row)]
+        metas = cls._row(result, "metadatas", row)
+        metas = [meta or {} for meta in metas[:len(docs)]] + [{}] * (len(docs) - len(metas))
+        dists = np.zeros(len(docs), dtype=np.float32)
+        raw_dists = cls._row(result, "distances", row)[:len(docs)]
+        dists[:len(raw_dists)] = raw_dists
+        return cls(docs, metas, dists)
+
+    @staticmethod
+    def _row(result: dict, field: str, row: int) -> list:
+        """Return one row of a query result field, or [] if it is absent."""
+        rows = result.get(field) or []
+        return list(rows[row] or []) if row < len(rows) else []
+
+    def take(self, indices: List[int]) -> "ChromaHits":
+        """Return the hits at the given positions, in that order."""
+        return ChromaHits(
+            [self.docs[i] for i in indices],
+            [self.metas[i] for i in indices],
+            self.dists[np.asarray(indices, dtype=np.intp)],
+        )
+
+
+EMPTY_HITS = ChromaHits([], [], np.empty(0, dtype=np.float32))
+
+
 class VirtualFrontDesk(ChromaDBService):
     """Virtual Front Desk for The Lewis College student inquiries."""
 
     RELEVANCE_THRESHOLD = 0.30
     TRANSLATED_RELEVANCE_THRESHOLD = 0.25
     RETRIEVAL_TOP_K = 15
+    QUERY_CACHE_SIZE = 256
+    SEMANTIC_CACHE_THRESHOLD = 0.97
+    RESPONSE_CACHE_SIZE = 2000
+    RESPONSE_CACHE_TTL = 600
+    COLLECTION_COUNT_TTL = 30.0
+    BATCH_WINDOW = 0.015
+    PROGRAM_SCAN_CHARS = 200
+    MAX_CONTEXT_CHARS = 6000
+    EMBEDDING_CACHE_SIZE = 1024
+    REWRITE_CACHE_SIZE = 512
+    MAX_BATCH_SIZE = 16
+
+    _NORMALIZE_PUNCT = str.maketrans("", "", "!?.")
+    # Shared, never-mutated ChromaDB where filters for the program-less case.
+    _ARCHIVED_FILTER = {"is_archived": True}
+    _CURRENT_FILTER = {"is_archived": False}
 
     _TAGALOG_MARKERS = {
         "ako", "ikaw", "siya", "kami", "tayo", "kayo", "sila",
@@ -51,13 +138,148 @@ class VirtualFrontDesk(ChromaDBService):
         "tanong", "sagot", "tulong", "impormasyon",
         "enrolla", "enrolled", "pasok", "klase",
     }
+    _TAGALOG_RE = re.compile(
+        r"\b(?:" + "|".join(map(re.escape, sorted(_TAGALOG_MARKERS, key=len, reverse=True))) + r")\b"
+    )
+
+    # System prompt fragments, joined per request by _create_system_prompt.
+    _SYS_PROMPT_PREFIX = """You are TLC ChatMate, the official virtual front desk of The Lewis College.
+
+YOUR ROLE:
+Provide accurate, professional, and friendly academic or administrative assistance strictly from the verified college records provided below.
+
+STRICT RESPONSE RULES — MUST FOLLOW:
+1. Answer ONLY using the DATABASE INFORMATION section below.
+2. If the exact information is not found in DATABASE INFORMATION, respond with:
+   "I'm sorry, but I don't have information about [topic] in our current records. You may visit the registrar or contact our office for assistance."
+   (Translate this message to match the student's language when applicable.)
+   Do NOT attempt to answer from general knowledge when this situation occurs.
+3. Do NOT guess, invent, assume, or use general knowledge outside of the provided DATABASE INFORMATION.
+4. Do NOT say "Based on my knowledge", "I believe", "I think", or similar hedging phrases.
+5. Do NOT fabricate details such as specific dates, amounts, requirements, or policies that are not explicitly stated in the database.
+6. Keep answers concise — 1 to 3 sentences unless listing requirements, steps, or fees.
+7. Use bullet points ONLY for: enrollment steps, fee breakdowns, checklists, or multi-item lists.
+8. Follow the LANGUAGE instruction given at the end of this message.
+9. Supported languages are English and Tagalog ONLY. Do NOT respond in any other language.
+10. If the student uses inappropriate or disruptive language, respond calmly:
+    "Let's keep our conversation respectful and focused on your academic needs."
+    (Translate to match the student's language when applicable.)
+11. For greetings — respond warmly but briefly; do not repeat the greeting on follow-up messages.
+12. For farewells — reply with a short, friendly closing message.
+13. Never start your response with "I" as the first word.
+14. PHILIPPINE ACADEMIC TERMINOLOGY — students at The Lewis College use local terminology:
+    - When a student says "subject" or "subjects", they mean an academic COURSE or unit
+      (e.g. Mathematics, English, PE). Match this against course/subject records.
+    - When a student says "course" or "courses", they mean a degree PROGRAM
+      (e.g. BSIT, BSBA, BEED). Match this against program records.
+    - Always interpret the student's words using this mapping and respond using
+      the same terminology the student used — do NOT correct or lecture them about it.
+15. SUBJECT LIST VERIFICATION — when the student asks for subjects in a specific year and semester:
+    a. First locate the exact YEAR label (e.g. "FIRST YEAR", "SECOND YEAR") AND the exact
+       SEMESTER label (e.g. "FIRST SEMESTER", "SECOND SEMESTER") inside the DATABASE INFORMATION.
+    b. List ONLY the subjects that appear under BOTH the matching year AND the matching semester.
+       Do NOT list subjects from a different year or a different semester even if they are nearby.
+    c. If the requested year or semester label does not exist anywhere in the DATABASE INFORMATION,
+       respond: "I'm sorry, but [program name] does not have a [year] [semester] in its curriculum.
+       Please check the year and semester and try again."
+       (Translate to match the student's language when applicable.)
+    d. Never infer or guess which year/semester a subject belongs to.
+       Only list subjects that are explicitly listed under that year and semester label.
+
+CONVERSATION FLOW:
+- Greeting (only at the start or when appropriate)
+- Direct, helpful answer from the database
+- Clarifying or follow-up question if needed
+- Friendly, professional closing tone
+
+"""
+    _SYS_GREETING_TEMPLATE = (
+        "GREETING (first message of the conversation — open with this):\n"
+        "{greeting}! I'm TLC ChatMate, the virtual front desk of The Lewis College. "
+        "I'm here to help with your questions about enrollment, programs, policies, and services.\n\n"
+    )
+    _SYS_ARCHIVED_NOTE = (
+        "IMPORTANT NOTE: The DATABASE INFORMATION below contains content from an ARCHIVED "
+        "(older / superseded) document because the student asked about a previous version. "
+        "Clearly state that the information is from an older archived document and advise "
+        "the student to verify current policies with the registrar or the relevant office.\n\n"
+    )
+    _SYS_LANGUAGE_INSTRUCTIONS = {
+        "tagalog": (
+            "LANGUAGE: The student is writing in Tagalog. "
+            "Respond entirely in Tagalog. "
+            "Apply every response rule identically — use only the DATABASE INFORMATION "
+            "provided, do not guess or add information not found in the database, "
+            "and keep the same accuracy and professionalism as you would in English."
+        ),
+        "mixed": (
+            "LANGUAGE: The student is mixing English and Tagalog. "
+            "Mirror the student's language mix naturally (Taglish). "
+            "Apply every response rule identically — use only the DATABASE INFORMATION "
+            "provided, do not guess or add information not found in the database."
+        ),
+        "english": "LANGUAGE: The student is writing in English. Respond in English.",
+    }
+    _SYS_DATABASE_HEADER = "\n\nDATABASE INFORMATION (only authoritative source):\n----------\n"
+    _SYS_FOOTER = "\n----------\n"
+
+    _REWRITER_SYSTEM_PROMPT = (
+        "You are a search-query rewriter for a Philippine college knowledge-base chatbot. "
+        "Your job is to convert a student's question into a single, self-contained English "
+        "search query that will retrieve the most relevant document chunks from a vector database.\n\n"
+        "RULES:\n"
+        "1. Output ONLY the JSON object described under OUTPUT FORMAT — no explanation.\n"
+        "2. Resolve all pronouns, ellipsis, and implicit references using the conversation history.\n"
+        "3. Expand partial entity references to their likely full form "
+        "(e.g. 'her name' → 'registrar full name', 'the dean' → 'dean name contact').\n"
+        "4. Include relevant synonyms or alternate phrasings that may appear in college documents "
+        "(e.g. 'how much' → 'tuition fee amount assessment', 'who is in charge' → 'head officer name position').\n"
+        "5. PHILIPPINE ACADEMIC TERMINOLOGY — always apply these mappings before generating the query:\n"
+        "   - 'subject' or 'subjects' → 'course' or 'courses' "
+        "(in the Philippines, 'subject' means an academic course/unit, e.g. Math, English)\n"
+        "   - 'course' or 'courses' → 'program' or 'programs' "
+        "(in the Philippines, 'course' means a degree program, e.g. BSIT, BSBA)\n"
+        "   Apply this mapping silently — do not explain it in the output.\n"
+        "6. PROGRAM NAME — always include the full, specific program name when the student "
+        "mentions or implies a program (e.g. 'ACT AppDev' → 'ACT Applications Development', "
+        "'networking' → 'ACT Networking', 'data engineering' → 'ACT Data Engineering', "
+        "'BSIT' → 'Bachelor of Science in Information Technology BSIT'). "
+        "This is critical because multiple programs share identical subject names.\n"
+        "7. If the question is already clear and complete, return it with minor enrichment only.\n"
+        "8. Always write the output in English regardless of the student's input language.\n"
+        "9. Keep the rewritten query concise — no more than 30 words.\n\n"
+        "OUTPUT FORMAT: a JSON object with two string keys:\n"
+        '- "rewritten_query": the rewritten retrieval query.\n'
+        '- "english_query": rewritten_query with any remaining non-English words '
+        "translated into English (identical to rewritten_query when it is already English)."
+    )
+    _CONFIRMATION_SYSTEM_PROMPT = (
+        "You are TLC ChatMate, the official virtual front desk of The Lewis College. "
+        "The student is asking you to confirm or validate your previous answer. "
+        "Your job is to confidently re-affirm that your previous response was accurate "
+        "using ONLY the DATABASE INFORMATION provided below. "
+        "Do NOT introduce any new information. "
+        "Do NOT use generic filler phrases like 'Absolutely!' or 'Of course!' alone — always include the substance. "
+        "Never start your response with 'I'. "
+        "Keep the response concise — 2 to 3 sentences at most. "
+    )
 
     def __init__(self, knowledge_repo: KnowledgeRepository):
-        load_dotenv()
         super().__init__()
         self.knowledge_repo = knowledge_repo
-        self.session_manager = SessionManager(max_history_per_session=4)
+        # Sessions live in process memory unless REDIS_URL is set, which lets
+        # several uvicorn workers share them.
+        redis_url = os.getenv("REDIS_URL")
+        self.session_manager = (
+            RedisSessionManager(redis_url, max_history_per_session=4)
+            if redis_url
+            else SessionManager(max_history_per_session=4)
+        )
+        self.response_cache = SemanticResponseCache(
+            max_size=self.RESPONSE_CACHE_SIZE, ttl=self.RESPONSE_CACHE_TTL
+        )
         self.ph_timezone = pytz.timezone("Asia/Manila")
+        self._greeting_cache = (0.0, "")
         self.version_detector = VersionDetector()
         self.llm_model = "gpt-4o-mini"
 
@@ -69,6 +291,10 @@ class VirtualFrontDesk(ChromaDBService):
             "general":  "asking about general questions such as enrollments, programs, courses, fees",
         }
 
+        self._intent_names = list(self.intents)
+        self._intent_matrix: Optional[np.ndarray] = None
+        self._intent_scores: Optional[np.ndarray] = None
+
         self.program_keywords = {
             "bsba_om":      ["operations management", "bsba om", "bsba-om"],
             "bsba_fm":      ["financial management", "bsba fm", "bsba-fm"],
@@ -84,17 +310,36 @@ class VirtualFrontDesk(ChromaDBService):
             "tcp":          ["teacher certificate", "tcp"],
         }
 
-        self.closing_keywords = {
+        # One scan over the prompt finds every keyword occurrence; the
+        # zero-width lookahead lets overlapping keywords all be reported.
+        self._keyword_program = {
+            keyword: (priority, program_id)
+            for priority, (program_id, keywords) in enumerate(self.program_keywords.items())
+            for keyword in keywords
+        }
+        self._program_re = re.compile(
+            "(?=("
+            + "|".join(map(re.escape, sorted(self._keyword_program, key=len, reverse=True)))
+            + "))"
+        )
+
+        self.closing_keywords = frozenset({
             "bye", "goodbye", "see you", "good bye",
             "paalam", "hanggang sa muli", "babay",
-        }
-        self.soft_closing_phrases = {
+        })
+        self.soft_closing_phrases = frozenset({
             "okay thanks", "ok thanks", "thank you", "thanks",
             "okay", "ok", "done", "alright",
             "salamat", "maraming salamat", "sige", "sige na",
             "ayos na", "tapos na", "okay na", "ok na", "ok lang",
-        }
-        self.confirmation_phrases = {
+        })
+        self.greeting_phrases = frozenset({
+            "hi", "hello", "hey", "good morning", "good afternoon", "good evening",
+            "hi po", "hello po", "kumusta", "kamusta", "kumusta po", "kamusta po",
+            "magandang umaga", "magandang hapon", "magandang gabi",
+            "magandang umaga po", "magandang hapon po", "magandang gabi po",
+        })
+        self.confirmation_phrases = frozenset({
             "is that correct", "is that right", "are you sure", "are you certain",
             "is that accurate", "is that true", "are you confident", "is that confirmed",
             "really", "are you sure about that", "is that so", "can you confirm",
@@ -103,9 +348,35 @@ class VirtualFrontDesk(ChromaDBService):
             "sigurado ba", "totoo ba", "totoo ba iyon", "totoo ba iyan",
             "kumpirmado ba", "pwede mo bang kumpirmahin", "talaga ba",
             "talaga", "ganon ba", "ganoon ba", "tama ba yun", "tama ba yan",
-        }
+        })
+
+        # Phrases are normalised like incoming prompts so "correct?" can match.
+        self._closing_phrases = self.closing_keywords | self.soft_closing_phrases
+        self._confirmation_re = re.compile(
+            r"\A(?:"
+            + "|".join(
+                r"\s+".join(map(re.escape, self._normalize_phrase(phrase).split()))
+                for phrase in sorted(self.confirmation_phrases, key=len, reverse=True)
+            )
+            + r")\Z"
+        )
 
-        self._empty_result = {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+        self._query_cache: OrderedDict = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        self._query_batcher = MicroBatcher(
+            self._run_query_batch, window=self.BATCH_WINDOW, max_batch=self.MAX_BATCH_SIZE
+        )
+        self._embedding_batcher = MicroBatcher(
+            self._run_embedding_batch, window=self.BATCH_WINDOW, max_batch=self.MAX_BATCH_SIZE
+        )
+        self._embedding_cache: OrderedDict = OrderedDict()
+        self._rewrite_cache: OrderedDict = OrderedDict()
+        self._collection = None
+        self._collection_count_cache = (0, 0.0)
+        self._collection_lock = threading.Lock()
+        # Sync generation this worker's caches were built against; None until
+        # the first sync (or the wait for a peer's sync) completes.
+        self._sync_generation: Optional[int] = None
 
         self._no_info_response = {
             "english": (
@@ -117,16 +388,68 @@ class VirtualFrontDesk(ChromaDBService):
                 "Maaari kang pumunta sa registrar o makipag-ugnayan sa aming opisina para sa karagdagang tulong."
             ),
         }
+        self._greeting_response = {
+            "english": (
+                "{greeting}! I'm TLC ChatMate, the virtual front desk of The Lewis College. "
+                "How can I help you with enrollment, programs, policies, or services today?"
+            ),
+            "tagalog": (
+                "{greeting}! Ako si TLC ChatMate, ang virtual front desk ng The Lewis College. "
+                "Paano kita matutulungan tungkol sa enrollment, mga programa, patakaran, o serbisyo?"
+            ),
+        }
+        self._closing_response = {
+            "english": (
+                "You're welcome! Thank you for reaching out to The Lewis College. "
+                "Feel free to come back anytime you have more questions. Take care!"
+            ),
+            "tagalog": (
+                "Walang anuman! Salamat sa pakikipag-ugnayan sa The Lewis College. "
+                "Bumalik ka lang anumang oras kung may iba ka pang katanungan. Ingat!"
+            ),
+        }
+        self._tagalog_greetings = {
+            "Good morning": "Magandang umaga",
+            "Good afternoon": "Magandang hapon",
+            "Good evening": "Magandang gabi",
+        }
+        self._sync_not_ready_response = {
+            "english": (
+                "TLC ChatMate is still loading the knowledge base. "
+                "Please wait a moment and try again."
+            ),
+            "tagalog": (
+                "Nilo-load pa ng TLC ChatMate ang knowledge base. "
+                "Mangyaring maghintay ng ilang sandali at subukan muli."
+            ),
+        }
+        self._record_removed_response = {
+            "english": (
+                "Apologies, but that information is no longer available in our current records. "
+                "You may visit the registrar or contact our office directly for further assistance."
+            ),
+            "tagalog": (
+                "Paumanhin, ang impormasyong iyon ay wala na sa aming mga kasalukuyang rekord. "
+                "Maaari kang pumunta sa registrar o makipag-ugnayan sa aming opisina para sa karagdagang tulong."
+            ),
+        }
 
     # -------------------------------------------------------------------------
     # Language Detection
     # -------------------------------------------------------------------------
 
-    def _detect_language(self, prompt: str) -> str:
-        """Detect whether prompt is primarily English, Tagalog, or mixed."""
-        tokens = set(prompt.lower().split())
-        tagalog_hits = tokens & self._TAGALOG_MARKERS
-        tagalog_ratio = len(tagalog_hits) / max(len(tokens), 1)
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def _detect_language(cls, prompt: str) -> str:
+        """
+        Detect whether prompt is primarily English, Tagalog, or mixed, from the
+        share of words that are Tagalog markers. Markers are found with one
+        precompiled regex scan, so trailing punctuation ("po?") still counts.
+        Results are memoised, since short prompts repeat heavily.
+        """
+        prompt_lower = prompt.lower()
+        tagalog_hits = len(cls._TAGALOG_RE.findall(prompt_lower))
+        tagalog_ratio = tagalog_hits / max(len(prompt_lower.split()), 1)
         if tagalog_ratio >= 0.4:
             return "tagalog"
         if tagalog_ratio >= 0.15:
@@ -141,30 +464,14 @@ class VirtualFrontDesk(ChromaDBService):
             return "The student is mixing English and Tagalog. Mirror their language naturally."
         return "Respond in English."
 
-    def _language_instruction(self, prompt: str) -> str:
+    def _language_instruction(self, lang: str) -> str:
         """
         Return the language-mirroring instruction to embed in the system prompt.
         Applies identical retrieval-grounded logic regardless of language.
         """
-        lang = self._detect_language(prompt)
-        if lang == "tagalog":
-            return (
-                "LANGUAGE: The student is writing in Tagalog. "
-                "Respond entirely in Tagalog. "
-                "Apply every response rule identically — use only the DATABASE INFORMATION "
-                "provided, do not guess or add information not found in the database, "
-                "and keep the same accuracy and professionalism as you would in English."
-            )
-        if lang == "mixed":
-            return (
-                "LANGUAGE: The student is mixing English and Tagalog. "
-                "Mirror the student's language mix naturally (Taglish). "
-                "Apply every response rule identically — use only the DATABASE INFORMATION "
-                "provided, do not guess or add information not found in the database."
-            )
-        return "LANGUAGE: The student is writing in English. Respond in English."
+        return self._SYS_LANGUAGE_INSTRUCTIONS.get(lang, self._SYS_LANGUAGE_INSTRUCTIONS["english"])
 
-    def _translate_to_english(self, prompt: str) -> str:
+    async def _translate_to_english(self, prompt: str) -> str:
         """
         Translate a Tagalog or mixed-language prompt into English for ChromaDB
         retrieval only. Returns the original prompt unchanged for English input.
@@ -172,7 +479,7 @@ class VirtualFrontDesk(ChromaDBService):
         if self._detect_language(prompt) == "english":
             return prompt
         try:
-            response = self.openai_client.chat.completions.create(
+            response = await self.async_openai_client.chat.completions.create(
                 model=self.llm_model,
                 messages=[
                     {
@@ -206,30 +513,98 @@ class VirtualFrontDesk(ChromaDBService):
         if self.knowledge_repo.progress.get("status") != "completed":
             return False
         try:
-            return self.get_collection().count() > 1
+            return self._collection_count(self._current_collection()) > 1
         except Exception:
             return False
 
+    def warm_collection(self) -> None:
+        """
+        Run one throwaway query so ChromaDB loads its embedding model and HNSW
+        index now rather than inside the first student's request. Called on
+        the sync thread once the collection has been (re)built.
+        """
+        started = time.perf_counter()
+        try:
+            collection = self._current_collection()
+            if self._collection_count(collection):
+                collection.query(query_texts=["warmup"], n_results=1, include=["distances"])
+        except Exception as e:
+            logger.warning("Collection warm-up failed: %s", e)
+            return
+        logger.info("Collection warmed in %.1fs", time.perf_counter() - started)
+
+    async def warm_intents(self) -> None:
+        """Fetch the intent-description embeddings at startup, not on the first prompt."""
+        try:
+            await self._get_intent_matrix()
+        except Exception as e:
+            logger.warning("Intent embedding warm-up failed: %s", e)
+
     # -------------------------------------------------------------------------
     # Intent Detection
     # -------------------------------------------------------------------------
 
-    def detect_intent(self, prompt: str) -> str:
+    async def _embed_prompt(self, prompt: str) -> np.ndarray:
+        """
+        Return the prompt embedding, served from a small LRU for repeated
+        prompts and otherwise fetched through the embedding batcher. Prompts
+        are case- and whitespace-folded first, so "What are the fees?" and
+        "what are  the fees?" share one entry. Vectors are kept as float32
+        arrays to bound the cache's memory. An empty or whitespace-only
+        prompt raises ValueError before reaching the batcher: OpenAI rejects
+        the whole embeddings request for an empty input, which would fail
+        every other caller coalesced into the same batch.
+        """
+        text = " ".join(prompt.lower().split())
+        if not text:
+            raise ValueError("Cannot embed an empty prompt")
+        cached = self._embedding_cache.get(text)
+        if cached is not None:
+            self._embedding_cache.move_to_end(text)
+            return cached
+
+        embedding = np.asarray(await self._embedding_batcher.submit(text), dtype=np.float32)
+        self._embedding_cache[text] = embedding
+        if len(self._embedding_cache) > self.EMBEDDING_CACHE_SIZE:
+            self._embedding_cache.popitem(last=False)
+        return embedding
+
+    async def _run_embedding_batch(self, _key, texts: List[str]) -> List[List[float]]:
+        """MicroBatcher callback: embed concurrently arriving prompts in one request."""
+        return await self.get_embeddings_async(texts)
+
+    async def detect_intent(self, prompt: str,
+                            prompt_embedding: Optional[np.ndarray] = None) -> str:
         """Detect intent from user prompt using embeddings."""
         try:
-            prompt_embedding = self.get_embedding(prompt)
-            best_intent, best_score = "general", -1.0
-            for intent_name, description in self.intents.items():
-                score = self.calculate_cosine_similarity(
-                    prompt_embedding, self.get_embedding(description)
-                )
-                if score > best_score:
-                    best_score = score
-                    best_intent = intent_name
-            return best_intent
+            if prompt_embedding is None:
+                prompt_embedding = await self._embed_prompt(prompt)
+            intent_matrix = await self._get_intent_matrix()
+            query = np.asarray(prompt_embedding, dtype=np.float32)
+            if not query.any():
+                return "general"
+            # Rows are unit-length, so the argmax is unaffected by the query's
+            # norm; scores land in a preallocated buffer, avoiding per-call
+            # allocation. No await separates the write from the read.
+            np.dot(intent_matrix, query, out=self._intent_scores)
+            return self._intent_names[int(self._intent_scores.argmax())]
         except Exception:
             return "general"
 
+    async def _get_intent_matrix(self) -> np.ndarray:
+        """
+        Return the L2-normalised intent-description embeddings, one row per
+        intent. They are fetched with a single batched request on first use
+        and reused afterwards.
+        """
+        if self._intent_matrix is None:
+            embeddings = await self.get_embeddings_async(list(self.intents.values()))
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._intent_scores = np.empty(matrix.shape[0], dtype=np.float32)
+            self._intent_matrix = np.ascontiguousarray(matrix)
+        return self._intent_matrix
+
     # -------------------------------------------------------------------------
     # Session & Conversation Helpers
     # -------------------------------------------------------------------------
@@ -237,313 +612,358 @@ class VirtualFrontDesk(ChromaDBService):
     def _is_initial_conversation(self, history: List[dict]) -> bool:
         return len(history) == 0
 
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def _normalize_phrase(cls, text: str) -> str:
+        """
+        Lower-case text and drop sentence punctuation in a single translate pass.
+        Memoised, so the closing and confirmation checks share one pass per
+        prompt and repeated short prompts ("thanks", "ok") cost a dict lookup.
+        """
+        return text.lower().translate(cls._NORMALIZE_PUNCT).strip()
+
     def _is_closing_message(self, prompt: str) -> bool:
-        normalised = prompt.lower().strip().rstrip("!")
-        return normalised in self.closing_keywords or normalised in self.soft_closing_phrases
+        return self._normalize_phrase(prompt) in self._closing_phrases
 
-    def _is_confirmation_query(self, prompt: str, history: List[dict]) -> bool:
+    def _is_greeting_message(self, prompt: str) -> bool:
+        return self._normalize_phrase(prompt) in self.greeting_phrases
+
+    def _get_closing_response(self, lang: str) -> str:
+        """Return the canned farewell, in the student's language."""
+        return self._closing_response.get(lang, self._closing_response["english"])
+
+    def _get_greeting_response(self, lang: str) -> str:
+        """Return the canned reply to a bare greeting, in the student's language."""
+        greeting = self._get_greeting()
+        if lang == "tagalog":
+            greeting = self._tagalog_greetings.get(greeting, greeting)
+        template = self._greeting_response.get(lang, self._greeting_response["english"])
+        return template.format(greeting=greeting)
+
+    async def _is_confirmation_query(self, prompt: str, session_id: str) -> bool:
         """Return True when the student is asking to validate a previous answer."""
-        if not history:
-            return False
-        if not any(m["role"] == "assistant" for m in history):
+        if await self.session_manager.get_last_assistant(session_id) is None:
             return False
-        normalised = prompt.lower().strip().rstrip("?!.")
-        return normalised in self.confirmation_phrases
+        return self._confirmation_re.match(self._normalize_phrase(prompt)) is not None
 
     def _extract_program_from_query(self, prompt: str) -> Optional[str]:
-        prompt_lower = prompt.lower()
-        for program_id, keywords in self.program_keywords.items():
-            for keyword in keywords:
-                if keyword in prompt_lower:
-                    return program_id
-        return None
+        """
+        Return the highest-priority program whose keyword appears in the prompt.
+        Priority follows program_keywords order, as the original nested loop did.
+        Only the first PROGRAM_SCAN_CHARS characters are scanned; program names
+        appear early in practice, and unfiltered retrieval still covers the rest.
+        """
+        head = prompt[:self.PROGRAM_SCAN_CHARS].lower()
+        hits = {match.group(1) for match in self._program_re.finditer(head)}
+        if not hits:
+            return None
+        return min(self._keyword_program[keyword] for keyword in hits)[1]
 
     def _get_greeting(self) -> str:
-        hour = datetime.now(self.ph_timezone).hour
-        if 5 <= hour < 12:
-            return "Good morning"
-        if 12 <= hour < 18:
-            return "Good afternoon"
-        return "Good evening"
+        """
+        Return the time-of-day greeting for Manila. The greeting only changes
+        on the hour, so it is cached until the next hour boundary.
+        """
+        expires_at, greeting = self._greeting_cache
+        if time.monotonic() < expires_at:
+            return greeting
+
+        now = datetime.now(self.ph_timezone)
+        if 5 <= now.hour < 12:
+            greeting = "Good morning"
+        elif 12 <= now.hour < 18:
+            greeting = "Good afternoon"
+        else:
+            greeting = "Good evening"
+        seconds_left = 3600 - (now.minute * 60 + now.second + now.microsecond / 1_000_000)
+        self._greeting_cache = (time.monotonic() + seconds_left, greeting)
+        return greeting
 
     # -------------------------------------------------------------------------
     # Query Rewriting
     # -------------------------------------------------------------------------
 
-    def rewrite_query_for_retrieval(
-        self, prompt: str, history: List[dict], archive_params: Optional[dict] = None
-    ) -> str:
+    async def rewrite_query_for_retrieval(
+        self, prompt: str, history_summary: str, archive_params: Optional[dict] = None
+    ) -> Tuple[str, str]:
         """
         Use an LLM to rewrite the student's prompt into a self-contained,
         semantically rich retrieval query in English.
 
+        Returns (retrieval_query, translated_query). The same call also returns
+        an English-only version of the query; it is used as translated_query
+        only when the rewritten query still reads as Tagalog or mixed, which
+        replaces the separate translation call.
+
+        history_summary is the session's precomputed rewriter summary (see
+        SessionManager.get_rewrite_summary).
+
         When archive_params indicates the student is asking about an older or
         archived version of a document, an explicit instruction is injected so
         the rewriter preserves — and enriches — the historical/archival intent.
         This ensures the ChromaDB semantic query matches archived chunk content
         even after pronoun resolution and entity expansion.
         """
-        history_summary = self._summarise_history_for_rewriter(history)
-
         archive_instruction = ""
         if archive_params and archive_params.get("include_archived"):
             specific_year = archive_params.get("specific_year")
             if specific_year:
                 archive_instruction = (
-                    f"\n10. ARCHIVE QUERY — the student is asking about a SPECIFIC OLDER VERSION "
+                    f"\n\n10. ARCHIVE QUERY — the student is asking about a SPECIFIC OLDER VERSION "
                     f"from {specific_year}. The rewritten query MUST include the year {specific_year} "
                     f"and terms like 'archived', 'old version', or 'previous version' so it matches "
                     f"archived document chunks in the vector database."
                 )
             else:
                 archive_instruction = (
-                    "\n10. ARCHIVE QUERY — the student is asking about an OLDER or PREVIOUS version "
+                    "\n\n10. ARCHIVE QUERY — the student is asking about an OLDER or PREVIOUS version "
                     "of a document. The rewritten query MUST preserve historical intent by including "
                     "terms like 'archived', 'old version', 'previous version', or 'superseded' so it "
                     "matches archived document chunks in the vector database."
                 )
 
-        system_content = (
-            "You are a search-query rewriter for a Philippine college knowledge-base chatbot. "
-            "Your job is to convert a student's question into a single, self-contained English "
-            "search query that will retrieve the most relevant document chunks from a vector database.\n\n"
-            "RULES:\n"
-            "1. Output ONLY the rewritten query — no explanation, no punctuation outside the query.\n"
-            "2. Resolve all pronouns, ellipsis, and implicit references using the conversation history.\n"
-            "3. Expand partial entity references to their likely full form "
-            "(e.g. 'her name' → 'registrar full name', 'the dean' → 'dean name contact').\n"
-            "4. Include relevant synonyms or alternate phrasings that may appear in college documents "
-            "(e.g. 'how much' → 'tuition fee amount assessment', 'who is in charge' → 'head officer name position').\n"
-            "5. PHILIPPINE ACADEMIC TERMINOLOGY — always apply these mappings before generating the query:\n"
-            "   - 'subject' or 'subjects' → 'course' or 'courses' "
-            "(in the Philippines, 'subject' means an academic course/unit, e.g. Math, English)\n"
-            "   - 'course' or 'courses' → 'program' or 'programs' "
-            "(in the Philippines, 'course' means a degree program, e.g. BSIT, BSBA)\n"
-            "   Apply this mapping silently — do not explain it in the output.\n"
-            "6. PROGRAM NAME — always include the full, specific program name when the student "
-            "mentions or implies a program (e.g. 'ACT AppDev' → 'ACT Applications Development', "
-            "'networking' → 'ACT Networking', 'data engineering' → 'ACT Data Engineering', "
-            "'BSIT' → 'Bachelor of Science in Information Technology BSIT'). "
-            "This is critical because multiple programs share identical subject names.\n"
-            "7. If the question is already clear and complete, return it with minor enrichment only.\n"
-            "8. Always write the output in English regardless of the student's input language.\n"
-            "9. Keep the rewritten query concise — no more than 30 words."
-            f"{archive_instruction}"
-        )
+        # Opening questions share the empty history summary and repeat heavily
+        # across students, so identical inputs reuse the earlier rewrite.
+        cache_key = (prompt, history_summary, archive_instruction)
+        cached = self._rewrite_cache.get(cache_key)
+        if cached is not None:
+            self._rewrite_cache.move_to_end(cache_key)
+            return cached
+
+        system_content = self._REWRITER_SYSTEM_PROMPT + archive_instruction
         user_content = (
             f"CONVERSATION HISTORY (most recent):\n{history_summary}\n\n"
             f"STUDENT'S CURRENT QUESTION: {prompt}\n\n"
-            "Rewritten retrieval query:"
+            "JSON:"
         )
 
         try:
-            response = self.openai_client.chat.completions.create(
+            response = await self.async_openai_client.chat.completions.create(
                 model=self.llm_model,
                 messages=[
                     {"role": "system", "content": system_content},
                     {"role": "user", "content": user_content},
                 ],
                 temperature=0.0,
-                max_tokens=80,
+                max_tokens=200,
+                response_format={"type": "json_object"},
             )
-            rewritten = response.choices[0].message.content.strip()
-            return rewritten if rewritten else prompt
+            data = json.loads(response.choices[0].message.content)
+            rewritten = str(data.get("rewritten_query") or "").strip() or prompt
         except Exception:
-            return prompt
+            return prompt, await self._translate_to_english(prompt)
 
-    def _summarise_history_for_rewriter(self, history: List[dict]) -> str:
-        """
-        Build a compact history string for the query rewriter.
-        Includes the last 3 user messages and the last assistant message.
-        """
-        if not history:
-            return "(no prior conversation)"
-
-        recent = history[-6:]
-        lines = []
-        last_assistant = None
-
-        for msg in recent:
-            if msg["role"] == "user":
-                lines.append(f"Student: {msg['content']}")
-            elif msg["role"] == "assistant":
-                last_assistant = msg["content"]
-
-        if last_assistant:
-            truncated = last_assistant[:300] + ("…" if len(last_assistant) > 300 else "")
-            lines.append(f"Assistant: {truncated}")
-
-        return "\n".join(lines) if lines else "(no prior conversation)"
+        if self._detect_language(rewritten) == "english":
+            result = (rewritten, rewritten)
+        else:
+            english = str(data.get("english_query") or "").strip()
+            result = (rewritten, english or rewritten)
 
-    def extract_main_topic(self, prompt: str, history: List[dict]) -> str:
-        """Expand prompt with previous question context if this is a follow-up."""
-        if len(history) < 2:
-            return prompt
-        last_user_messages = [m for m in history[-2:] if m["role"] == "user"]
-        if not last_user_messages:
-            return prompt
-        if self.is_follow_up_question(prompt, last_user_messages[-1]["content"]):
-            return f"{last_user_messages[-1]['content']} {prompt}"
-        return prompt
+        self._rewrite_cache[cache_key] = result
+        if len(self._rewrite_cache) > self.REWRITE_CACHE_SIZE:
+            self._rewrite_cache.popitem(last=False)
+        return result
 
     # -------------------------------------------------------------------------
     # Prompt Construction
     # -------------------------------------------------------------------------
 
     def _create_system_prompt(self, context: str, is_initial: bool,
-                              prompt: str = "", has_archived_content: bool = False) -> str:
+                              lang: str = "english", has_archived_content: bool = False) -> str:
         """Build the system prompt. History is passed separately via messages list."""
         greeting_line = ""
         if is_initial:
-            greeting = self._get_greeting()
-            greeting_line = (
-                f"{greeting}! I'm TLC ChatMate, the virtual front desk of The Lewis College. "
-                "I'm here to help with your questions about enrollment, programs, policies, and services.\n\n"
-            )
-
-        archived_note = ""
-        if has_archived_content:
-            archived_note = (
-                "\nIMPORTANT NOTE: The DATABASE INFORMATION below contains content from an ARCHIVED "
-                "(older / superseded) document because the student asked about a previous version. "
-                "Clearly state that the information is from an older archived document and advise "
-                "the student to verify current policies with the registrar or the relevant office.\n"
-            )
-
-        language_instruction = self._language_instruction(prompt)
-
-        return f"""You are TLC ChatMate, the official virtual front desk of The Lewis College.
-
-{greeting_line}YOUR ROLE:
-Provide accurate, professional, and friendly academic or administrative assistance strictly from the verified college records provided below.
-
-STRICT RESPONSE RULES — MUST FOLLOW:
-1. Answer ONLY using the DATABASE INFORMATION section below.
-2. If the exact information is not found in DATABASE INFORMATION, respond with:
-   "I'm sorry, but I don't have information about [topic] in our current records. You may visit the registrar or contact our office for assistance."
-   (Translate this message to match the student's language when applicable.)
-   Do NOT attempt to answer from general knowledge when this situation occurs.
-3. Do NOT guess, invent, assume, or use general knowledge outside of the provided DATABASE INFORMATION.
-4. Do NOT say "Based on my knowledge", "I believe", "I think", or similar hedging phrases.
-5. Do NOT fabricate details such as specific dates, amounts, requirements, or policies that are not explicitly stated in the database.
-6. Keep answers concise — 1 to 3 sentences unless listing requirements, steps, or fees.
-7. Use bullet points ONLY for: enrollment steps, fee breakdowns, checklists, or multi-item lists.
-8. {language_instruction}
-9. Supported languages are English and Tagalog ONLY. Do NOT respond in any other language.
-10. If the student uses inappropriate or disruptive language, respond calmly:
-    "Let's keep our conversation respectful and focused on your academic needs."
-    (Translate to match the student's language when applicable.)
-11. For greetings — respond warmly but briefly; do not repeat the greeting on follow-up messages.
-12. For farewells — reply with a short, friendly closing message.
-13. Never start your response with "I" as the first word.
-14. PHILIPPINE ACADEMIC TERMINOLOGY — students at The Lewis College use local terminology:
-    - When a student says "subject" or "subjects", they mean an academic COURSE or unit
-      (e.g. Mathematics, English, PE). Match this against course/subject records.
-    - When a student says "course" or "courses", they mean a degree PROGRAM
-      (e.g. BSIT, BSBA, BEED). Match this against program records.
-    - Always interpret the student's words using this mapping and respond using
-      the same terminology the student used — do NOT correct or lecture them about it.
-15. SUBJECT LIST VERIFICATION — when the student asks for subjects in a specific year and semester:
-    a. First locate the exact YEAR label (e.g. "FIRST YEAR", "SECOND YEAR") AND the exact
-       SEMESTER label (e.g. "FIRST SEMESTER", "SECOND SEMESTER") inside the DATABASE INFORMATION.
-    b. List ONLY the subjects that appear under BOTH the matching year AND the matching semester.
-       Do NOT list subjects from a different year or a different semester even if they are nearby.
-    c. If the requested year or semester label does not exist anywhere in the DATABASE INFORMATION,
-       respond: "I'm sorry, but [program name] does not have a [year] [semester] in its curriculum.
-       Please check the year and semester and try again."
-       (Translate to match the student's language when applicable.)
-    d. Never infer or guess which year/semester a subject belongs to.
-       Only list subjects that are explicitly listed under that year and semester label.
-{archived_note}
-CONVERSATION FLOW:
-- Greeting (only at the start or when appropriate)
-- Direct, helpful answer from the database
-- Clarifying or follow-up question if needed
-- Friendly, professional closing tone
-
-DATABASE INFORMATION (only authoritative source):
-----------
-{context}
-----------
-"""
+            greeting_line = self._SYS_GREETING_TEMPLATE.format(greeting=self._get_greeting())
+
+        archived_note = self._SYS_ARCHIVED_NOTE if has_archived_content else ""
+
+        # Static rules come first and are byte-identical across requests so the
+        # provider can reuse its prompt-prefix cache; per-request parts follow.
+        return "".join((
+            self._SYS_PROMPT_PREFIX,
+            greeting_line,
+            archived_note,
+            self._language_instruction(lang),
+            self._SYS_DATABASE_HEADER,
+            context,
+            self._SYS_FOOTER,
+        ))
 
     # -------------------------------------------------------------------------
     # ChromaDB Retrieval
     # -------------------------------------------------------------------------
 
-    def _query_collection(self, query: str, where_filter: dict,
-                          n_results: int = RETRIEVAL_TOP_K) -> dict:
+    async def _query_collection(self, query: str, where_filter: Optional[dict],
+                                n_results: int = RETRIEVAL_TOP_K,
+                                with_metadata: bool = False) -> ChromaHits:
         """
-        Query ChromaDB and return results with distance scores.
-        Retries with a force-refreshed client when an initial query returns
-        nothing, then falls back to the broadest non-archived filter.
+        Query ChromaDB through a small LRU cache keyed on the query text,
+        filter, result count, and whether metadata was requested. Misses go
+        through the query batcher so that concurrent requests sharing a filter
+        become a single ChromaDB call. Only non-empty results are cached so
+        the fallback logic still runs for misses.
         """
-        broad_filter = {"is_archived": False}
+        where_key = json.dumps(where_filter, sort_keys=True)
+        batch_key = (where_key, n_results, with_metadata)
+        cache_key = (query, *batch_key)
+        with self._query_cache_lock:
+            cached = self._query_cache.get(cache_key)
+            if cached is not None:
+                self._query_cache.move_to_end(cache_key)
+                return cached
+
+        result = await self._query_batcher.submit(query, key=batch_key)
+
+        if result.docs:
+            with self._query_cache_lock:
+                self._query_cache[cache_key] = result
+                if len(self._query_cache) > self.QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+        return result
+
+    async def _run_query_batch(self, key: Tuple[str, int, bool],
+                               queries: List[str]) -> List[ChromaHits]:
+        """MicroBatcher callback: run one batched ChromaDB query off the event loop."""
+        where_key, n_results, with_metadata = key
+        return await asyncio.to_thread(
+            self._query_collection_many, queries, json.loads(where_key), n_results, with_metadata
+        )
+
+    def clear_query_cache(self) -> None:
+        """Drop cached ChromaDB results, e.g. after the collection is rebuilt."""
+        with self._query_cache_lock:
+            self._query_cache.clear()
+
+    def invalidate_collection(self) -> None:
+        """Forget the cached collection handle and count after a sync."""
+        with self._collection_lock:
+            self._collection = None
+            self._collection_count_cache = (0, 0.0)
 
-        def _run_query(collection, where: dict) -> dict:
+    def reset_after_sync(self, generation: Optional[int] = None) -> None:
+        """
+        Reopen the ChromaDB clients and drop every cache that may hold
+        pre-sync results. Dropping only the collection handle would keep the
+        old PersistentClient and its cached segment state, which can keep
+        answering from the deleted index.
+
+        Args:
+            generation: The published sync generation this reset catches up
+                to, recorded so _sync_caches_with_peers does not repeat it.
+                None (it could not be read) keeps the recorded generation.
+        """
+        if generation is not None:
+            self._sync_generation = generation
+        self.knowledge_repo.reinitialize_client()
+        try:
+            self._current_collection(force_refresh=True)
+        except Exception as e:
+            logger.warning("Collection reload failed, retrying on next query: %s", e)
+            self.invalidate_collection()
+        self.clear_query_cache()
+        self.response_cache.clear()
+
+    async def _sync_caches_with_peers(self) -> None:
+        """
+        Reset this worker's collection handle and result caches when another
+        worker sharing the session store has published a sync since they
+        were built. Called at the start of every turn.
+        """
+        if self._sync_generation is None:
+            return
+        try:
+            generation = await self.session_manager.get_sync_generation()
+        except Exception as e:
+            logger.warning("Could not read the sync generation: %s", e)
+            return
+        if generation != self._sync_generation:
+            await asyncio.to_thread(self.reset_after_sync, generation)
+
+    def _current_collection(self, force_refresh: bool = False):
+        """
+        Return the cached collection handle, fetching it on first use. Queries
+        run in worker threads, so the lock keeps concurrent misses or error
+        refreshes from re-creating the client more than once.
+        """
+        with self._collection_lock:
+            if force_refresh or self._collection is None:
+                self._collection = self.get_collection(force_refresh=force_refresh)
+                self._collection_count_cache = (0, 0.0)
+            return self._collection
+
+    def _collection_count(self, collection) -> int:
+        """Return the collection size, re-counting at most every COLLECTION_COUNT_TTL seconds."""
+        count, fetched_at = self._collection_count_cache
+        now = time.monotonic()
+        if fetched_at == 0.0 or now - fetched_at > self.COLLECTION_COUNT_TTL:
             count = collection.count()
+            self._collection_count_cache = (count, now)
+        return count
+
+    def _query_collection_many(self, queries: List[str], where_filter: Optional[dict],
+                               n_results: int = RETRIEVAL_TOP_K,
+                               with_metadata: bool = False) -> List[ChromaHits]:
+        """
+        Query ChromaDB for several texts sharing one filter in a single call and
+        return one ChromaHits per text, with distance scores. Chunk metadata is
+        only fetched and materialised when with_metadata is set.
+        Texts whose initial query returns nothing fall back to the broadest
+        non-archived filter; the client is only force-refreshed after an error.
+        """
+        broad_filter = self._CURRENT_FILTER
+        include = ["documents", "distances"] + (["metadatas"] if with_metadata else [])
+
+        def _run_query(collection, texts: List[str], where: Optional[dict]) -> List[ChromaHits]:
+            count = self._collection_count(collection)
             if count == 0:
-                return self._empty_result
-            return collection.query(
-                query_texts=[query],
+                return [EMPTY_HITS] * len(texts)
+            result = collection.query(
+                query_texts=texts,
                 n_results=min(n_results, count),
                 where=where,
-                include=["documents", "metadatas", "distances"],
+                include=include,
             )
-
-        def _has_results(result: dict) -> bool:
-            docs = result.get("documents", [[]])
-            return bool(docs and docs[0])
+            return [ChromaHits.from_query(result, row) for row in range(len(texts))]
 
         try:
-            collection = self.get_collection()
-            result = _run_query(collection, where_filter)
-
-            if not _has_results(result):
-                collection = self.get_collection(force_refresh=True)
-                result = _run_query(collection, where_filter)
+            collection = self._current_collection()
+            results = _run_query(collection, queries, where_filter)
 
-            if not _has_results(result) and where_filter != broad_filter:
-                result = _run_query(collection, broad_filter)
+            missing = [row for row, hits in enumerate(results) if not hits.docs]
+            if missing and where_filter != broad_filter:
+                fallback = _run_query(collection, [queries[row] for row in missing], broad_filter)
+                for row, hits in zip(missing, fallback):
+                    results[row] = hits
 
-            return result
+            return results
 
         except Exception:
             try:
-                collection = self.get_collection(force_refresh=True)
-                return collection.query(
-                    query_texts=[query],
-                    n_results=min(n_results, collection.count()),
-                    where=broad_filter,
-                    include=["documents", "metadatas", "distances"],
-                )
+                collection = self._current_collection(force_refresh=True)
+                return _run_query(collection, queries, broad_filter)
             except Exception:
-                return self._empty_result
+                return [EMPTY_HITS] * len(queries)
 
-    def _extract_context_from_results(self, results: dict,
-                                       threshold: Optional[float] = None) -> str:
+    def _extract_context_from_results(self, hits: ChromaHits,
+                                      threshold: Optional[float] = None) -> str:
         """
         Build a context string from retrieved chunks, filtering out chunks
         below the relevance threshold.
         ChromaDB returns cosine distance in [0, 2]; similarity = 1 - distance/2.
         """
-        effective_threshold = threshold if threshold is not None else self.RELEVANCE_THRESHOLD
-        doc_list = (results.get("documents", [[]])[0] or [])
-        dist_list = (results.get("distances", [[]])[0] or [])
-
-        context_parts = []
-        for idx, doc in enumerate(doc_list):
-            if not isinstance(doc, str) or not doc.strip():
-                continue
-            if idx < len(dist_list):
-                similarity = 1.0 - dist_list[idx] / 2.0
-                if similarity < effective_threshold:
-                    continue
-            context_parts.append(doc.strip())
+        return self._join_chunks(hits.docs[i] for i in self._relevant_indices(hits, threshold))
 
-        return "\n\n".join(context_parts)
+    def _relevant_indices(self, hits: ChromaHits, threshold: Optional[float] = None) -> List[int]:
+        """
+        Return indices of non-empty chunks whose similarity meets the threshold.
+        similarity >= t is evaluated as distance <= 2 - 2t over the whole
+        distance vector at once.
+        """
+        effective_threshold = threshold if threshold is not None else self.RELEVANCE_THRESHOLD
+        keep = hits.dists <= (2.0 - 2.0 * effective_threshold)
+        return [int(i) for i in np.flatnonzero(keep) if hits.docs[i].strip()]
 
-    def _rerank_chunks(self, query: str, chunks: List[str], top_n: int = 5) -> List[str]:
+    async def _rerank_chunks(self, query: str, chunks: List[str], top_n: int = 5) -> List[str]:
         """
         Use the LLM to rerank retrieved chunks by relevance to the query.
         Falls back to the original order when the LLM call fails or returns
@@ -568,7 +988,7 @@ DATABASE INFORMATION (only authoritative source):
         )
 
         try:
-            response = self.openai_client.chat.completions.create(
+            response = await self.async_openai_client.chat.completions.create(
                 model=self.llm_model,
                 messages=[
                     {"role": "system", "content": system_content},
@@ -592,52 +1012,74 @@ DATABASE INFORMATION (only authoritative source):
 
     def _merge_context_strings(self, primary: str, secondary: str) -> str:
         """Merge two context strings, de-duplicating by chunk content."""
+        return self._join_chunks(primary.split("\n\n") + secondary.split("\n\n"))
+
+    def _join_chunks(self, chunks: Iterable[str]) -> str:
+        """
+        Join chunks in order, skipping empty ones and duplicates, and stop
+        before the total exceeds MAX_CONTEXT_CHARS (the first chunk is always
+        kept). Chunks are compared case- and whitespace-insensitively, and only
+        their hashes are kept in the seen set; the strings live in kept.
+        """
         seen: set = set()
-        merged: List[str] = []
-        for chunk in primary.split("\n\n") + secondary.split("\n\n"):
+        kept: List[str] = []
+        total = 0
+        for chunk in chunks:
             chunk = chunk.strip()
-            if chunk and chunk not in seen:
-                seen.add(chunk)
-                merged.append(chunk)
-        return "\n\n".join(merged)
-
-    def _prioritise_year_chunks(self, results: dict, target_year: int,
+            if not chunk:
+                continue
+            chunk_hash = hash(" ".join(chunk.lower().split()))
+            if chunk_hash in seen:
+                continue
+            if kept and total + len(chunk) > self.MAX_CONTEXT_CHARS:
+                break
+            seen.add(chunk_hash)
+            kept.append(chunk)
+            total += len(chunk) + 2
+        return "\n\n".join(kept)
+
+    def _prioritise_year_chunks(self, hits: ChromaHits, target_year: int,
                                 threshold: Optional[float] = None) -> str:
         """
         Re-order archived chunks so those whose revision_year metadata matches
         target_year appear first, then apply the normal relevance filter.
         """
-        effective_threshold = threshold if threshold is not None else self.RELEVANCE_THRESHOLD
-        doc_list = (results.get("documents", [[]])[0] or [])
-        dist_list = (results.get("distances", [[]])[0] or [])
-        meta_list = (results.get("metadatas", [[]])[0] or [])
-
         prioritised: List[str] = []
         rest: List[str] = []
 
-        for idx, doc in enumerate(doc_list):
-            if not isinstance(doc, str) or not doc.strip():
-                continue
-            if idx < len(dist_list):
-                similarity = 1.0 - dist_list[idx] / 2.0
-                if similarity < effective_threshold:
-                    continue
-            meta = meta_list[idx] if idx < len(meta_list) else {}
-            if meta.get("revision_year") == target_year:
-                prioritised.append(doc.strip())
+        for idx in self._relevant_indices(hits, threshold):
+            if hits.metas[idx].get("revision_year") == target_year:
+                prioritised.append(hits.docs[idx])
             else:
-                rest.append(doc.strip())
+                rest.append(hits.docs[idx])
 
-        return "\n\n".join(prioritised + rest)
+        return self._join_chunks(prioritised + rest)
 
-    def _retrieve_context(self, retrieval_query: str, prompt: str,
-                          translated_query: str) -> Tuple[str, bool]:
+    def _split_by_archive(self, hits: ChromaHits,
+                          limit: int) -> Tuple[ChromaHits, ChromaHits]:
+        """
+        Split a single query's hits into (archived, current) by each chunk's
+        is_archived metadata, keeping at most limit hits per side.
+        Hits stay in distance order.
+        """
+        archived: List[int] = []
+        current: List[int] = []
+        for idx, meta in enumerate(hits.metas):
+            bucket = archived if meta.get("is_archived") else current
+            if len(bucket) < limit:
+                bucket.append(idx)
+        return hits.take(archived), hits.take(current)
+
+    async def _retrieve_context(self, retrieval_query: str, prompt: str,
+                                translated_query: str,
+                                archive_params: Optional[dict] = None) -> Tuple[str, bool]:
         """
         Retrieve context from ChromaDB with archive-awareness.
 
         retrieval_query  – LLM-rewritten query built from history + topic.
         prompt           – original student prompt (archive params / language).
         translated_query – English translation of retrieval_query for Tagalog/mixed input.
+        archive_params   – should_include_archived(prompt), when the caller already has it.
 
         Program detection checks both the original prompt and the rewritten
         retrieval_query so that queries where the program name is only resolved
@@ -646,7 +1088,8 @@ DATABASE INFORMATION (only authoritative source):
         When a program_id is detected, only chunks tagged with that program_id
         are retrieved — no merging with the general pool.
         """
-        archive_params = self.version_detector.should_include_archived(prompt)
+        if archive_params is None:
+            archive_params = self.version_detector.should_include_archived(prompt)
         program_id = (
             self._extract_program_from_query(prompt)
             or self._extract_program_from_query(retrieval_query)
@@ -662,47 +1105,52 @@ DATABASE INFORMATION (only authoritative source):
         )
         query_for_chroma = translated_query
 
-        def _archived_filter() -> dict:
-            if program_id:
-                return {"$and": [{"is_archived": True}, {"program_id": program_id}]}
-            return {"is_archived": True}
+        # A detected program restricts both pools to that program's chunks.
+        if program_id:
+            archived_filter = {"$and": [{"is_archived": True}, {"program_id": program_id}]}
+            current_filter = {"$and": [{"is_archived": False}, {"program_id": program_id}]}
+            mixed_filter = {"program_id": program_id}
+        else:
+            archived_filter = self._ARCHIVED_FILTER
+            current_filter = self._CURRENT_FILTER
+            mixed_filter = None
 
-        def _fetch_archived_context() -> str:
-            results = self._query_collection(
-                query_for_chroma, _archived_filter(), n_results=self.RETRIEVAL_TOP_K
-            )
-            raw = self._extract_context_from_results(results, threshold)
-            if raw and specific_year:
-                raw = self._prioritise_year_chunks(results, specific_year, threshold)
-            return raw
-
-        def _fetch_current_context() -> str:
-            if program_id:
-                results = self._query_collection(
-                    query_for_chroma,
-                    {"$and": [{"is_archived": False}, {"program_id": program_id}]},
-                    n_results=self.RETRIEVAL_TOP_K,
-                )
-                return self._extract_context_from_results(results, threshold)
+        def _archived_context(hits: ChromaHits) -> str:
+            # Both helpers apply the same relevance mask, so only one is needed.
+            if specific_year:
+                return self._prioritise_year_chunks(hits, specific_year, threshold)
+            return self._extract_context_from_results(hits, threshold)
 
-            results = self._query_collection(
-                query_for_chroma, {"is_archived": False}, n_results=self.RETRIEVAL_TOP_K
+        async def _fetch(where_filter: Optional[dict], n_results: int = self.RETRIEVAL_TOP_K,
+                         with_metadata: bool = False) -> ChromaHits:
+            return await self._query_collection(
+                query_for_chroma, where_filter, n_results=n_results, with_metadata=with_metadata
             )
-            return self._extract_context_from_results(results, threshold)
 
         has_archived_content = False
 
         if not include_archived:
-            context = _fetch_current_context()
+            context = self._extract_context_from_results(await _fetch(current_filter), threshold)
         elif archived_only:
-            context = _fetch_archived_context()
+            # Metadata is only read to prioritise a requested revision year.
+            context = _archived_context(
+                await _fetch(archived_filter, with_metadata=bool(specific_year))
+            )
             if context:
                 has_archived_content = True
             else:
-                context = _fetch_current_context()
+                context = self._extract_context_from_results(
+                    await _fetch(current_filter), threshold
+                )
         else:
-            archived_context = _fetch_archived_context()
-            current_context = _fetch_current_context()
+            # Both pools are needed: one wider query without the archive
+            # filter, split into archived and current rows afterwards.
+            archived_results, current_results = self._split_by_archive(
+                await _fetch(mixed_filter, n_results=self.RETRIEVAL_TOP_K * 3, with_metadata=True),
+                self.RETRIEVAL_TOP_K,
+            )
+            archived_context = _archived_context(archived_results)
+            current_context = self._extract_context_from_results(current_results, threshold)
             if archived_context:
                 context = self._merge_context_strings(archived_context, current_context)
                 has_archived_content = True
@@ -711,7 +1159,7 @@ DATABASE INFORMATION (only authoritative source):
 
         if context:
             raw_chunks = [c for c in context.split("\n\n") if c.strip()]
-            reranked_chunks = self._rerank_chunks(retrieval_query, raw_chunks, top_n=5)
+            reranked_chunks = await self._rerank_chunks(retrieval_query, raw_chunks, top_n=5)
             context = "\n\n".join(reranked_chunks)
 
         return context, has_archived_content
@@ -720,26 +1168,26 @@ DATABASE INFORMATION (only authoritative source):
     # History Management
     # -------------------------------------------------------------------------
 
-    def _update_conversation_history(
-        self, session_id: str, history: List[dict], prompt: str, ai_response: str
-    ) -> None:
-        history.append({"role": "user", "content": prompt})
-        history.append({"role": "assistant", "content": ai_response})
-        self.session_manager.update_history(session_id, history[-8:])
+    async def _update_conversation_history(self, session_id: str, prompt: str,
+                                           ai_response: str) -> None:
+        await self.session_manager.add_exchange(session_id, prompt, ai_response)
 
     # -------------------------------------------------------------------------
     # LLM Response Generators
     # -------------------------------------------------------------------------
 
-    def _call_llm(self, system_prompt: str, history: List[dict],
-                  prompt: str, temperature: float, max_tokens: int) -> str:
-        """Shared helper to call the LLM and return the response text."""
+    async def _call_llm(self, system_prompt: str, recent_history: List[dict],
+                        prompt: str, temperature: float, max_tokens: int) -> str:
+        """
+        Shared helper to call the LLM and return the response text.
+        recent_history is the already-trimmed tail of the conversation.
+        """
         messages = [
             {"role": "system", "content": system_prompt},
-            *history[-4:],
+            *recent_history,
             {"role": "user", "content": prompt},
         ]
-        response = self.openai_client.chat.completions.create(
+        response = await self.async_openai_client.chat.completions.create(
             model=self.llm_model,
             messages=messages,
             temperature=temperature,
@@ -748,184 +1196,407 @@ DATABASE INFORMATION (only authoritative source):
         )
         return response.choices[0].message.content.strip()
 
-    def _generate_closing_response(self, prompt: str, history: List[dict]) -> str:
-        """Generate a warm, language-aware closing response."""
-        lang = self._detect_language(prompt)
-        lang_instruction = self._build_lang_instruction(lang)
-        system_prompt = (
-            "You are TLC ChatMate, the official virtual front desk of The Lewis College. "
-            "The student is wrapping up the conversation. "
-            "Respond with a warm, sincere, and professional farewell that feels natural given the conversation. "
-            "You may acknowledge what was discussed if appropriate, wish them well, and invite them to return anytime. "
-            "Do NOT use hollow or repetitive phrases. "
-            "Never start your response with 'I'. "
-            f"Keep it brief — 2 to 3 sentences at most. {lang_instruction}"
-        )
-        return self._call_llm(system_prompt, history, prompt, temperature=0.4, max_tokens=150)
-
-    def _generate_confirmation_response(self, prompt: str, context: str,
-                                        history: List[dict]) -> str:
+    async def _generate_confirmation_response(self, prompt: str, context: str,
+                                              recent_history: List[dict], lang: str) -> str:
         """
         Generate a language-aware confirmation response grounded in live database
         context. If the context is empty (the document was deleted since the last
         response), the VFD honestly admits it no longer has that information instead
         of blindly re-affirming stale history.
         """
-        lang = self._detect_language(prompt)
         lang_instruction = self._build_lang_instruction(lang)
 
         if not context:
-            if lang == "tagalog":
-                return (
-                    "Paumanhin, ang impormasyong iyon ay wala na sa aming mga kasalukuyang rekord. "
-                    "Maaari kang pumunta sa registrar o makipag-ugnayan sa aming opisina para sa karagdagang tulong."
-                )
-            return (
-                "Apologies, but that information is no longer available in our current records. "
-                "You may visit the registrar or contact our office directly for further assistance."
-            )
+            return self._record_removed_response.get(lang, self._record_removed_response["english"])
 
-        system_prompt = (
-            "You are TLC ChatMate, the official virtual front desk of The Lewis College. "
-            "The student is asking you to confirm or validate your previous answer. "
-            "Your job is to confidently re-affirm that your previous response was accurate "
-            "using ONLY the DATABASE INFORMATION provided below. "
-            "Do NOT introduce any new information. "
-            "Do NOT use generic filler phrases like 'Absolutely!' or 'Of course!' alone — always include the substance. "
-            "Never start your response with 'I'. "
-            f"Keep the response concise — 2 to 3 sentences at most. {lang_instruction}\n\n"
-            f"DATABASE INFORMATION:\n----------\n{context}\n----------"
-        )
-        return self._call_llm(system_prompt, history, prompt, temperature=0.3, max_tokens=200)
+        system_prompt = "".join((
+            self._CONFIRMATION_SYSTEM_PROMPT,
+            lang_instruction,
+            "\n\nDATABASE INFORMATION:\n----------\n",
+            context,
+            "\n----------",
+        ))
+        return await self._call_llm(system_prompt, recent_history, prompt, temperature=0.3, max_tokens=200)
 
     # -------------------------------------------------------------------------
     # Core Processing
     # -------------------------------------------------------------------------
 
-    def process_prompt(self, request: PromptRequest) -> PromptResponse:
-        """Process a student prompt and return a grounded, accurate response."""
+    async def _prepare_turn(self, request: PromptRequest) -> dict:
+        """
+        Run every step of a turn up to the main LLM call.
+
+        Returns a dict carrying the intent plus either "response" (the turn was
+        answered without the main LLM call and is already recorded) or the
+        "messages" for the grounded completion, which the caller generates and
+        hands to _finalize_turn.
+        """
         prompt = request.prompt.strip()
         conversation_session = request.conversationSession
+        await self._sync_caches_with_peers()
 
-        intent = self.detect_intent(prompt)
-
-        if not self.session_manager.session_exists(conversation_session):
-            self.session_manager.create_session(conversation_session, request.username)
+        if not await self.session_manager.session_exists(conversation_session):
+            await self.session_manager.create_session(conversation_session, request.username)
 
-        history = self.session_manager.get_session_history(conversation_session)
+        history = await self.session_manager.get_session_history(conversation_session)
         is_initial = self._is_initial_conversation(history)
+        recent_history = history[-4:]
+        lang = self._detect_language(prompt)
+
+        async def _embed_and_classify() -> Tuple[Optional[np.ndarray], str]:
+            try:
+                embedding = await self._embed_prompt(prompt)
+            except Exception:
+                embedding = None
+            return embedding, await self.detect_intent(prompt, embedding)
+
+        async def _answered(response: str, record: bool = True) -> dict:
+            if record:
+                await self._update_conversation_history(conversation_session, prompt, response)
+            return {"intent": intent, "response": response}
 
+        # Farewells are matched locally and get a canned reply, so they make
+        # no embedding, retrieval, or LLM call.
         if self._is_closing_message(prompt):
-            closing_response = self._generate_closing_response(prompt, history)
-            self._update_conversation_history(
-                conversation_session, history, prompt, closing_response
-            )
-            return PromptResponse(
-                success=True, response=closing_response, requires_auth=False, intent=intent
-            )
+            intent = "general"
+            return await _answered(self._get_closing_response(lang))
+
+        # A bare greeting has nothing to retrieve, so it gets a canned reply
+        # without the embedding, rewrite, retrieval, or any LLM call.
+        if self._is_greeting_message(prompt):
+            intent = "general"
+            return await _answered(self._get_greeting_response(lang))
+
+        # Embedding + intent detection runs alongside whichever LLM call the
+        # turn needs next instead of ahead of it.
+        classify_task = asyncio.ensure_future(_embed_and_classify())
 
         if not self._is_sync_ready():
-            lang = self._detect_language(prompt)
-            sync_response = (
-                "Nilo-load pa ng TLC ChatMate ang knowledge base. "
-                "Mangyaring maghintay ng ilang sandali at subukan muli."
-                if lang == "tagalog"
-                else (
-                    "TLC ChatMate is still loading the knowledge base. "
-                    "Please wait a moment and try again."
-                )
-            )
-            return PromptResponse(
-                success=True, response=sync_response, requires_auth=False, intent=intent
+            _, intent = await classify_task
+            sync_response = self._sync_not_ready_response.get(
+                lang, self._sync_not_ready_response["english"]
             )
+            return await _answered(sync_response, record=False)
+
+        is_confirmation = await self._is_confirmation_query(prompt, conversation_session)
 
         # Resolve archive intent before rewriting so the rewriter can preserve it.
         archive_params = self.version_detector.should_include_archived(prompt)
 
         # LLM-rewritten retrieval query — resolves pronouns, ellipsis, entity
-        # references, and preserves archival intent when required.
-        retrieval_query = self.rewrite_query_for_retrieval(prompt, history, archive_params)
-        translated_query = self._translate_to_english(retrieval_query)
+        # references, and preserves archival intent when required. Started
+        # before awaiting classification so it overlaps the embedding request.
+        rewrite_summary = await self.session_manager.get_rewrite_summary(conversation_session)
+        rewrite_task = asyncio.ensure_future(
+            self.rewrite_query_for_retrieval(prompt, rewrite_summary, archive_params)
+        )
+        _, intent = await classify_task
+        retrieval_query, translated_query = await rewrite_task
 
         # Confirmation queries re-validate against the live database context so
         # that deleted documents no longer produce stale re-affirmations.
-        if self._is_confirmation_query(prompt, history):
-            context, _ = self._retrieve_context(retrieval_query, prompt, translated_query)
-            confirmation_response = self._generate_confirmation_response(
-                prompt, context, history
+        if is_confirmation:
+            context, _ = await self._retrieve_context(
+                retrieval_query, prompt, translated_query, archive_params
             )
-            self._update_conversation_history(
-                conversation_session, history, prompt, confirmation_response
-            )
-            return PromptResponse(
-                success=True, response=confirmation_response, requires_auth=False, intent=intent
+            return await _answered(
+                await self._generate_confirmation_response(prompt, context, recent_history, lang)
             )
 
-        context, has_archived_content = self._retrieve_context(
-            retrieval_query, prompt, translated_query
+        # Answers are looked up by the embedding of the self-contained English
+        # query, never the raw prompt, so a context-dependent follow-up such as
+        # "how much is it?" only matches an answer about the same topic. A
+        # repeat within the session is checked first; answers shared across
+        # sessions are scoped by language and, for opening turns, by the
+        # greeting they start with. The lookups overlap retrieval, which is
+        # cancelled on a hit.
+        cache_scope = (lang, self._get_greeting() if is_initial else None)
+        retrieval_task = asyncio.ensure_future(
+            self._retrieve_context(retrieval_query, prompt, translated_query, archive_params)
         )
+        try:
+            query_embedding = await self._embed_prompt(translated_query)
+        except Exception:
+            query_embedding = None
+        if query_embedding is not None:
+            cached_response = await self.session_manager.find_cached_response(
+                conversation_session, query_embedding, self.SEMANTIC_CACHE_THRESHOLD, lang
+            )
+            if cached_response is None:
+                cached_response = self.response_cache.get(
+                    query_embedding, cache_scope, self.SEMANTIC_CACHE_THRESHOLD
+                )
+            if cached_response is not None:
+                retrieval_task.cancel()
+                return await _answered(cached_response)
+
+        context, has_archived_content = await retrieval_task
 
         if not context:
-            lang = self._detect_language(prompt)
-            ai_response = self._get_no_info_response(lang)
-            self._update_conversation_history(
-                conversation_session, history, prompt, ai_response
-            )
-            return PromptResponse(
-                success=True, response=ai_response, requires_auth=False, intent=intent
-            )
+            return await _answered(self._get_no_info_response(lang))
 
         system_prompt = self._create_system_prompt(
-            context, is_initial, prompt=prompt, has_archived_content=has_archived_content
+            context, is_initial, lang=lang, has_archived_content=has_archived_content
         )
-        messages = [
-            {"role": "system", "content": system_prompt},
-            *history[-4:],
-            {"role": "user", "content": prompt},
-        ]
+        return {
+            "intent": intent,
+            "session_id": conversation_session,
+            "prompt": prompt,
+            "lang": lang,
+            "query_embedding": query_embedding,
+            "cache_scope": cache_scope,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                *recent_history,
+                {"role": "user", "content": prompt},
+            ],
+        }
 
-        response = self.openai_client.chat.completions.create(
+    async def _answer_completion(self, messages: List[dict], stream: bool = False):
+        """Create the main grounded completion for a prepared turn."""
+        return await self.async_openai_client.chat.completions.create(
             model=self.llm_model,
             messages=messages,
             temperature=0.2,
             max_tokens=500,
             top_p=0.9,
+            stream=stream,
         )
-        ai_response = response.choices[0].message.content.strip()
 
-        self._update_conversation_history(conversation_session, history, prompt, ai_response)
+    async def _finalize_turn(self, turn: dict, ai_response: str) -> None:
+        """Record a generated answer in history and the semantic response caches."""
+        session_id = turn["session_id"]
+        await self._update_conversation_history(session_id, turn["prompt"], ai_response)
+        if turn["query_embedding"] is not None:
+            await self.session_manager.cache_response(
+                session_id, turn["query_embedding"], ai_response, turn["lang"]
+            )
+            self.response_cache.put(turn["query_embedding"], turn["cache_scope"], ai_response)
+
+    async def process_prompt(self, request: PromptRequest) -> PromptResponse:
+        """Process a student prompt and return a grounded, accurate response."""
+        turn = await self._prepare_turn(request)
+        if "response" in turn:
+            return PromptResponse(
+                success=True, response=turn["response"], requires_auth=False, intent=turn["intent"]
+            )
+
+        response = await self._answer_completion(turn["messages"])
+        ai_response = response.choices[0].message.content.strip()
+        await self._finalize_turn(turn, ai_response)
 
         return PromptResponse(
-            success=True, response=ai_response, requires_auth=False, intent=intent
+            success=True, response=ai_response, requires_auth=False, intent=turn["intent"]
         )
 
-    def get_all_sessions(self) -> List[str]:
-        return self.session_manager.get_all_sessions()
-
+    async def stream_prompt(self, request: PromptRequest) -> AsyncIterator[str]:
+        """
+        Process a student prompt and yield the answer as server-sent events.
 
-# ---------------------------------------------------------------------------
-# FastAPI Application
-# ---------------------------------------------------------------------------
+        Each event is a JSON object: {"delta": ...} for every generated piece,
+        then a final {"done": true, ...} event shaped like PromptResponse that
+        carries the full answer.
+        """
+        def _event(payload: dict) -> str:
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        turn = await self._prepare_turn(request)
+        if "response" in turn:
+            yield _event({"delta": turn["response"]})
+            yield _event({
+                "done": True, "success": True, "response": turn["response"],
+                "requires_auth": False, "intent": turn["intent"],
+            })
+            return
+
+        parts: List[str] = []
+        try:
+            async for chunk in await self._answer_completion(turn["messages"], stream=True):
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield _event({"delta": delta})
+        except Exception:
+            yield _event({
+                "done": True, "success": False, "response": "".join(parts).strip(),
+                "requires_auth": False, "intent": turn["intent"],
+            })
+            return
 
-app = FastAPI()
-knowledge_repo = KnowledgeRepository()
-vfd = VirtualFrontDesk(knowledge_repo)
+        ai_response = "".join(parts).strip()
+        await self._finalize_turn(turn, ai_response)
+        yield _event({
+            "done": True, "success": True, "response": ai_response,
+            "requires_auth": False, "intent": turn["intent"],
+        })
 
+    async def get_all_sessions(self) -> List[str]:
+        return await self.session_manager.get_all_sessions()
 
-def _run_sync():
-    """Run a full sync and clear all session histories afterwards."""
-    knowledge_repo.sync_data_to_chromadb()
-    vfd.session_manager.clear_all_histories()
 
+# ---------------------------------------------------------------------------
+# FastAPI Application
+# ---------------------------------------------------------------------------
 
-@app.on_event("startup")
-async def startup_event():
-    threading.Thread(target=_run_sync, daemon=True).start()
+# Built in lifespan, not at import: the spawned sync child re-imports this
+# module (as __mp_main__ under `python VirtualFrontDesk.py`) and must not
+# construct a second front desk with its own clients and session store.
+knowledge_repo: Optional[KnowledgeRepository] = None
+vfd: Optional[VirtualFrontDesk] = None
+_sync_lock = threading.Lock()
+SESSION_IDLE_TIMEOUT = 3600
+SESSION_SWEEP_INTERVAL = 600
+STARTUP_SYNC_LOCK = ".vfd_startup_sync.lock"
+_sync_thread: Optional[threading.Thread] = None
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _on_event_loop(coro):
+    """
+    Run a session-store coroutine from a sync thread and wait for its result.
+    It runs on the server's event loop, which owns the store's connections.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop).result()
+
+
+def _run_sync(lock_fd: Optional[int] = None):
+    """
+    Run a full sync and clear all session histories afterwards. lock_fd, if
+    given, is the startup-sync lock file. The sync's final status is written
+    into it for workers waiting in _await_peer_sync, and closing it releases
+    the flock.
+    """
+    try:
+        knowledge_repo.sync_in_subprocess()
+        # Published first so other workers sharing Redis drop their caches
+        # too; this worker then resets and adopts the new generation.
+        try:
+            generation = _on_event_loop(vfd.session_manager.bump_sync_generation())
+        except Exception as e:
+            generation = None
+            logger.warning("Could not publish the sync to other workers: %s", e)
+        vfd.reset_after_sync(generation)
+        _on_event_loop(vfd.session_manager.clear_all_histories())
+    finally:
+        if lock_fd is not None:
+            try:
+                os.write(lock_fd, knowledge_repo.progress["status"].encode())
+            finally:
+                os.close(lock_fd)
+    vfd.warm_collection()
+
+
+def _start_sync(lock_fd: Optional[int] = None) -> bool:
+    """
+    Start a background sync unless one is already running. The check and the
+    start happen under one lock, so concurrent triggers cannot launch two
+    syncs against the same collection. The thread is a daemon so that server
+    shutdown never waits for a long sync to finish.
+
+    Args:
+        lock_fd: Startup-sync lock file to release once the sync ends.
+
+    Returns:
+        True if a sync was started, False if one was already running.
+    """
+    global _sync_thread
+    with _sync_lock:
+        if _sync_thread is not None and _sync_thread.is_alive():
+            if lock_fd is not None:
+                os.close(lock_fd)
+            return False
+        knowledge_repo.set_progress("Starting", "running")
+        _sync_thread = threading.Thread(target=_run_sync, args=(lock_fd,), daemon=True)
+        _sync_thread.start()
+        return True
+
+
+def _start_startup_sync() -> None:
+    """
+    Run the startup sync in only one worker per host. The worker that takes
+    an exclusive flock on STARTUP_SYNC_LOCK syncs and holds the lock until
+    the sync ends. The other workers wait for the lock on a daemon thread and
+    then use the rebuilt collection instead of rebuilding it themselves.
+    """
+    if fcntl is None:
+        _start_sync()
+        return
+    lock_fd = os.open(STARTUP_SYNC_LOCK, os.O_CREAT | os.O_RDWR)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        knowledge_repo.set_progress("Waiting for another worker's sync", "running")
+        threading.Thread(target=_await_peer_sync, args=(lock_fd,), daemon=True).start()
+        return
+    # Clear the previous outcome; an empty file means the sync never finished.
+    os.ftruncate(lock_fd, 0)
+    _start_sync(lock_fd)
+
+
+def _await_peer_sync(lock_fd: int) -> None:
+    """
+    Block until the syncing worker releases the startup lock, then go live
+    and report the status that worker wrote into the lock file.
+    """
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        os.lseek(lock_fd, 0, os.SEEK_SET)
+        peer_status = os.read(lock_fd, 64).decode(errors="replace").strip()
+    finally:
+        os.close(lock_fd)
+    try:
+        generation = _on_event_loop(vfd.session_manager.get_sync_generation())
+    except Exception as e:
+        generation = None
+        logger.warning("Could not read the sync generation: %s", e)
+    vfd.reset_after_sync(generation)
+    if peer_status == "completed":
+        knowledge_repo.set_progress("Completed", "completed")
+    else:
+        logger.error("Startup sync in another worker did not complete (status: %r)",
+                     peer_status or "unknown")
+        knowledge_repo.set_progress("Error", "error")
+    vfd.warm_collection()
+
+
+async def _expire_sessions_periodically():
+    """Drop idle sessions so the in-process session store stays bounded."""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        await vfd.session_manager.clear_expired_sessions(SESSION_IDLE_TIMEOUT)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    global knowledge_repo, vfd, _event_loop
+    knowledge_repo = KnowledgeRepository()
+    vfd = VirtualFrontDesk(knowledge_repo)
+    _event_loop = asyncio.get_running_loop()
+    _start_startup_sync()
+    warmup = asyncio.create_task(vfd.warm_intents())
+    sweeper = asyncio.create_task(_expire_sessions_periodically())
+    yield
+    warmup.cancel()
+    sweeper.cancel()
+    await close_async_http_client()
+    await vfd.session_manager.close()
+
+
+app = FastAPI(lifespan=lifespan)
+# Event streams are excluded by the middleware, so SSE deltas are not buffered.
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
 
 
 @app.post("/VirtualFrontDesk", response_model=PromptResponse)
 async def ask_question(request: PromptRequest):
-    return vfd.process_prompt(request)
+    return await vfd.process_prompt(request)
+
+
+@app.post("/VirtualFrontDesk/stream")
+async def ask_question_stream(request: PromptRequest):
+    return StreamingResponse(vfd.stream_prompt(request), media_type="text/event-stream")
 
 
 @app.get("/health")
@@ -935,13 +1606,13 @@ async def health_check():
 
 @app.get("/sessions")
 async def get_sessions():
-    sessions = vfd.get_all_sessions()
+    sessions = await vfd.get_all_sessions()
     return {"sessions": sessions, "total": len(sessions)}
 
 
 @app.get("/sessions/{session_id}")
 async def get_session_info(session_id: str):
-    metadata = vfd.session_manager.get_session_metadata(session_id)
+    metadata = await vfd.session_manager.get_session_metadata(session_id)
     if not metadata:
         return {"error": "Session not found"}
     return metadata
@@ -949,21 +1620,20 @@ async def get_session_info(session_id: str):
 
 @app.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
-    if vfd.session_manager.delete_session(session_id):
+    if await vfd.session_manager.delete_session(session_id):
         return {"success": True, "message": f"Session {session_id} deleted"}
     return {"success": False, "message": "Session not found"}
 
 
 @app.get("/admin/sync-status")
 async def get_sync_status():
-    return knowledge_repo.get_progress()
+    return {**knowledge_repo.get_progress(), "response_cache": vfd.response_cache.stats()}
 
 
 @app.post("/admin/sync")
-async def trigger_sync(background_tasks: BackgroundTasks):
-    if knowledge_repo.progress["status"] == "running":
+async def trigger_sync():
+    if not _start_sync():
         return {"success": False, "message": "Sync already in progress"}
-    background_tasks.add_task(_run_sync)
     return {"success": True, "message": "Sync started"}
 
 
@@ -974,7 +1644,22 @@ async def check_updates():
 
 
 def start_fastapi_server():
-    uvicorn.run("VirtualFrontDesk:app", host="127.0.0.1", port=8000, reload=True)
+    # uvicorn[standard] picks uvloop and httptools automatically where they are
+    # available (uvloop has no Windows build). Several workers need REDIS_URL
+    # so that they share sessions; only one of them runs the startup sync
+    # (see _start_startup_sync). The auto-reloader is for development only
+    # (VFD_RELOAD=true) and excludes workers.
+    reload = os.getenv("VFD_RELOAD", "false").lower() == "true"
+    uvicorn.run(
+        "VirtualFrontDesk:app",
+        host=os.getenv("VFD_HOST", "127.0.0.1"),
+        port=int(os.getenv("VFD_PORT", "8000")),
+        reload=reload,
+        workers=None if reload else int(os.getenv("VFD_WORKERS", "1")),
+        access_log=os.getenv("VFD_ACCESS_LOG", "true").lower() == "true",
+        limit_concurrency=int(os.getenv("VFD_LIMIT_CONCURRENCY", "0")) or None,
+        timeout_keep_alive=int(os.getenv("VFD_KEEP_ALIVE", "5")),
+    )
 
 
 if __name__ == "__main__":
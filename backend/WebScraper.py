@@ -1,43 +1,116 @@
-import time
+import logging
+import re
+import threading
 import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict
+from bs4 import BeautifulSoup, NavigableString
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
 from datetime import datetime
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
 
 
 class WebScraper:
     """Handles scraping and processing of website content."""
 
     # HTML elements whose content is purely presentational and never informational.
-    _DISCARD_TAGS = ['script', 'style', 'nav', 'header', 'iframe', 'svg', 'form']
+    _DISCARD_TAGS = ('script', 'style', 'nav', 'header', 'iframe', 'svg', 'form')
+    # Removed in the same pass once the footer text has been captured.
+    _STRIP_TAGS = _DISCARD_TAGS + ('footer',)
+
+    # Footer tags that carry contact/location text.
+    _FOOTER_CSS = 'a, p, span, li, h1, h2, h3, h4, h5, h6, strong, em, td, th'
+
+    # Maps URL separators to underscores when building chunk ids.
+    _URL_ID_TABLE = str.maketrans('/.', '__')
+
+    # A newline with any surrounding whitespace, including blank lines.
+    _LINE_BREAK_RE = re.compile(r'\s*\n\s*')
+
+    # Pages fetched in parallel overall, and at most this many per host so a
+    # single site is never hit by the whole pool at once.
+    MAX_WORKERS = 10
+    MAX_PER_HOST = 4
 
     def __init__(self):
         self.timeout = 30
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
+        # One pooled session for every scrape, so pages on the same host reuse
+        # the kept-alive TCP/TLS connection. Rate limiting and transient server
+        # errors are retried by urllib3 with exponential backoff, waiting as
+        # long as the server's Retry-After asks.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=20,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                respect_retry_after_header=True,
+            ),
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self) -> None:
+        """Release the pooled connections. The session stays usable afterwards."""
+        self.session.close()
 
     def get_urls_from_database(self, repo) -> List[Dict]:
         """Fetch URLs from the database URL table."""
         db = repo.get_db_connection()
         if not db:
-            print("Failed to connect to database to fetch URLs")
+            logger.error("Failed to connect to database to fetch URLs")
             return []
 
         try:
             conn = db.cursor()
             conn.execute("SELECT link_url, description, updated_at FROM url")
-            urls = [
-                {"url": row[0], "description": row[1], "updated_at": row[2]}
-                for row in conn.fetchall()
+            # Rows are read straight off the cursor rather than via fetchall(),
+            # so only the dicts the scraper needs are materialised.
+            return [
+                {"url": url, "description": description, "updated_at": updated_at}
+                for url, description, updated_at in conn
             ]
-            db.close()
-            return urls
         except Exception as e:
-            print(f"Error fetching URLs from database: {e}")
-            if db:
-                db.close()
+            logger.error("Error fetching URLs from database: %s", e)
             return []
+        finally:
+            db.close()
+
+    def get_cached_pages(self, repo) -> Dict[str, List]:
+        """
+        Read the chunks of every scraped page in the current collection,
+        grouped by URL and ordered by chunk index. Only pages stored with an
+        ETag or Last-Modified validator are returned, since those are the
+        only ones a conditional request can confirm as unchanged.
+
+        Returns:
+            Mapping of URL to a list of (chunk_index, document, metadata).
+        """
+        try:
+            collection = repo.client.get_collection(name=repo.collection_name)
+            stored = collection.get(where={"data_type": "url"}, include=["documents", "metadatas"])
+        except Exception as e:
+            logger.info("No previously scraped pages available: %s", e)
+            return {}
+
+        pages = {}
+        for document, meta in zip(stored['documents'], stored['metadatas']):
+            if meta.get('etag') or meta.get('last_modified'):
+                pages.setdefault(meta['source_url'], []).append(
+                    (meta['chunk_index'], document, meta)
+                )
+        for chunks in pages.values():
+            chunks.sort(key=lambda chunk: chunk[0])
+        return pages
 
     def _extract_footer_text(self, soup: BeautifulSoup) -> str:
         """
@@ -52,12 +125,9 @@ class WebScraper:
 
         lines = []
 
-        # Walk every element inside the footer in document order.
-        for element in footer.descendants:
-            # Only process tag nodes; raw NavigableStrings are handled via parent tags.
-            if not hasattr(element, 'name'):
-                continue
-
+        # One selector visits only the tags of interest, in document order,
+        # instead of testing every descendant node in Python.
+        for element in footer.select(self._FOOTER_CSS):
             if element.name == 'a':
                 link_text = element.get_text(strip=True)
                 href = element.get('href', '').strip()
@@ -74,43 +144,69 @@ class WebScraper:
                 elif link_text:
                     lines.append(link_text)
 
-            elif element.name in ('p', 'span', 'li', 'h1', 'h2', 'h3',
-                                  'h4', 'h5', 'h6', 'strong', 'em', 'td', 'th'):
+            else:
                 # Capture direct text nodes of this element only (not its children),
                 # so we don't duplicate text already captured from child <a> tags.
                 direct_text = ''.join(
-                    str(child) for child in element.children
-                    if not hasattr(child, 'name')  # NavigableString only
+                    child for child in element.children
+                    if type(child) is NavigableString  # excludes comments/CDATA
                 ).strip()
                 if direct_text:
                     lines.append(direct_text)
 
-        # De-duplicate while preserving order, then drop blank entries.
-        seen = set()
-        unique_lines = []
-        for line in lines:
-            normalised = line.strip()
-            if normalised and normalised not in seen:
-                seen.add(normalised)
-                unique_lines.append(normalised)
+        # Entries are already stripped; drop blanks (e.g. a bare "mailto:")
+        # and de-duplicate while preserving order.
+        return '\n'.join(dict.fromkeys(filter(None, lines)))
 
-        return '\n'.join(unique_lines)
+    def scrape_website_content(self, url: str, description: str,
+                               cached: Optional[List] = None) -> Dict:
+        """
+        Scrape content from a single URL.
+
+        Args:
+            url: Page to fetch.
+            description: Description stored for the URL in the database.
+            cached: The page's chunks from the previous sync, as returned by
+                get_cached_pages. Their validators make the request
+                conditional.
+
+        Returns:
+            {'url', 'content', 'etag', 'last_modified'} for a fetched page,
+            {'url', 'unchanged': True} when the server answers 304, or None.
+        """
+        headers = {}
+        if cached:
+            validators = cached[0][2]
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
 
-    def scrape_website_content(self, url: str, description: str) -> Dict:
-        """Scrape content from a single URL."""
         try:
-            response = requests.get(url, headers=self.headers, timeout=self.timeout)
-            response.raise_for_status()
+            # Streamed so that non-HTML links (PDFs, images) are rejected on
+            # their headers without downloading the body.
+            with self.session.get(url, headers=headers, timeout=self.timeout,
+                                  stream=True) as response:
+                if response.status_code == 304 and cached:
+                    return {'url': url, 'unchanged': True}
+                response.raise_for_status()
 
-            if 'text/html' not in response.headers.get('Content-Type', ''):
-                return None
+                content_type = response.headers.get('Content-Type', '')
+                if 'text/html' not in content_type:
+                    return None
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+                # lxml is the C-backed parser. A charset declared in the header is
+                # passed through so BeautifulSoup skips sniffing the bytes; without
+                # one, requests would guess ISO-8859-1, so lxml reads the <meta> tag.
+                declared = response.encoding if 'charset=' in content_type.lower() else None
+                soup = BeautifulSoup(response.content, 'lxml', from_encoding=declared)
+                etag = response.headers.get('ETag', '')
+                last_modified = response.headers.get('Last-Modified', '')
 
             # Capture footer text before discarding the tag.
             footer_text = self._extract_footer_text(soup)
 
-            for element in soup(self._DISCARD_TAGS + ['footer']):
+            for element in soup.find_all(self._STRIP_TAGS):
                 element.decompose()
 
             main_content = (
@@ -120,8 +216,7 @@ class WebScraper:
             )
 
             body_text = (main_content or soup).get_text(separator='\n', strip=True)
-            body_lines = [line.strip() for line in body_text.split('\n') if line.strip()]
-            body_text = '\n'.join(body_lines)
+            body_text = self._LINE_BREAK_RE.sub('\n', body_text)
 
             # Append footer text as a clearly labelled section so it is stored
             # in the vector database as its own retrievable content.
@@ -136,49 +231,124 @@ class WebScraper:
             if not full_content:
                 return None
 
-            return {'url': url, 'content': full_content}
+            return {
+                'url': url,
+                'content': full_content,
+                'etag': etag,
+                'last_modified': last_modified,
+            }
 
         except requests.RequestException as e:
-            print(f"Failed to scrape {url}: {e}")
+            logger.warning("Failed to scrape %s: %s", url, e)
             return None
         except Exception as e:
-            print(f"Error processing {url}: {e}")
+            logger.error("Error processing %s: %s", url, e)
             return None
 
     def scrape_all_websites(self, repo) -> List[Dict]:
-        """Scrape content from all URLs stored in database."""
+        """
+        Scrape content from all URLs stored in database. Pages are fetched
+        concurrently on the pooled session; results keep the database order.
+        A page whose database row is unchanged since the last sync is
+        requested conditionally, and on a 304 its previous chunks are reused
+        instead of being downloaded and parsed again.
+        """
         url_data = self.get_urls_from_database(repo)
         if not url_data:
             return []
 
+        cached_pages = self.get_cached_pages(repo)
+        host_limits = {
+            host: threading.BoundedSemaphore(self.MAX_PER_HOST)
+            for host in {urlsplit(item['url']).netloc for item in url_data}
+        }
+
+        def cached_chunks(item: Dict) -> Optional[List]:
+            cached = cached_pages.get(item['url'])
+            if not cached:
+                return None
+            stored = cached[0][2]
+            # The description is part of the page text and updated_at marks
+            # an edit of the row, so either changing forces a full fetch.
+            if (stored.get('description') != (item['description'] or '')
+                    or stored.get('updated_at') != self._format_updated_at(item['updated_at'])):
+                return None
+            return cached
+
+        def scrape(item: Dict):
+            with host_limits[urlsplit(item['url']).netloc]:
+                return self.scrape_website_content(
+                    item['url'], item['description'], cached_chunks(item)
+                )
+
+        workers = min(self.MAX_WORKERS, len(url_data))
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape") as executor:
+                results = list(executor.map(scrape, url_data))
+        finally:
+            # Syncs are hours apart, so idle keep-alive sockets are not worth holding.
+            self.close()
+
         all_content = []
-        for item in url_data:
-            result = self.scrape_website_content(item['url'], item['description'])
-            if result:
-                all_content.append({
-                    'url': item['url'],
-                    'description': item['description'],
-                    'updated_at': item['updated_at'],
-                    'content': result['content'],
-                    'scraped_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                })
-            time.sleep(2)
+        for item, result in zip(url_data, results):
+            if not result:
+                continue
+            page = {
+                'url': item['url'],
+                'description': item['description'],
+                'updated_at': item['updated_at'],
+            }
+            if result.get('unchanged'):
+                page['cached_chunks'] = cached_pages[item['url']]
+            else:
+                page.update(
+                    content=result['content'],
+                    etag=result['etag'],
+                    last_modified=result['last_modified'],
+                    scraped_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                )
+            all_content.append(page)
 
         return all_content
 
+    @staticmethod
+    def _format_updated_at(updated_at) -> str:
+        """Render a url row's updated_at the way it is stored in chunk metadata."""
+        return updated_at.strftime('%Y-%m-%d %H:%M:%S') if updated_at else ''
+
     def process_scraped_content(self, scraped_data: List[Dict], documents: List[str],
                                 metadata: List[Dict], ids: List[str], text_splitter) -> None:
-        """Process scraped website content into chunks."""
+        """
+        Process scraped website content into chunks. Pages confirmed
+        unchanged by a conditional request keep their previous chunks and
+        metadata as they are.
+        """
         for item in scraped_data:
             url = item['url']
+
+            if url.startswith('https://'):
+                url_id = url[8:]
+            elif url.startswith('http://'):
+                url_id = url[7:]
+            else:
+                url_id = url
+            url_id = url_id.translate(self._URL_ID_TABLE).rstrip('_')
+
+            if item.get('cached_chunks'):
+                for idx, chunk, chunk_metadata in item['cached_chunks']:
+                    documents.append(chunk)
+                    ids.append(f"url_{url_id}_chunk_{idx}")
+                    metadata.append(chunk_metadata)
+                continue
+
             content = item['content']
             if not content.strip():
                 continue
 
-            url_id = (
-                url.replace('https://', '').replace('http://', '')
-                   .replace('/', '_').replace('.', '_').rstrip('_')
-            )
+            # Fields shared by every chunk of this page, computed once.
+            description = item.get('description', '')
+            scraped_at = item['scraped_at']
+            updated_at = self._format_updated_at(item['updated_at'])
 
             for idx, chunk in enumerate(text_splitter.split_text(content)):
                 documents.append(chunk)
@@ -186,13 +356,12 @@ class WebScraper:
                 metadata.append({
                     "source_url": url,
                     "data_type": "url",
-                    "description": item.get('description', ''),
-                    "scraped_at": item['scraped_at'],
-                    "updated_at": (
-                        item['updated_at'].strftime('%Y-%m-%d %H:%M:%S')
-                        if item['updated_at'] else ''
-                    ),
+                    "description": description,
+                    "scraped_at": scraped_at,
+                    "updated_at": updated_at,
+                    "etag": item['etag'],
+                    "last_modified": item['last_modified'],
                     "chunk_index": idx,
                     "is_archived": False,
                     "document_version": "current",
-                })
\ No newline at end of file
+                })
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import VirtualFrontDesk
+
+# The front desk opens chroma_db relative to the working directory; build it in
+# a scratch directory so the checked-in database is untouched.
+_WORKDIR = tempfile.TemporaryDirectory()
+_previous_cwd = os.getcwd()
+os.chdir(_WORKDIR.name)
+try:
+    _VFD = VirtualFrontDesk.VirtualFrontDesk(VirtualFrontDesk.KnowledgeRepository())
+finally:
+    os.chdir(_previous_cwd)
+
+
+class FakeCollection:
+    """Mimics collection.query(): fields missing from include come back as None."""
+
+    def __init__(self):
+        self.calls = []
+
+    def count(self):
+        return 3
+
+    def query(self, query_texts, n_results, where, include):
+        self.calls.append(list(query_texts))
+        return {
+            "documents": [[f"{text} doc {i}" for i in range(n_results)] for text in query_texts],
+            "distances": [[0.1 * i for i in range(n_results)] for _ in query_texts]
+                         if "distances" in include else None,
+            "metadatas": [[{"data_type": "url"}] * n_results for _ in query_texts]
+                         if "metadatas" in include else None,
+        }
+
+
+class QueryBatchingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vfd = _VFD
+        self.vfd.clear_query_cache()
+        self.vfd.invalidate_collection()
+        self.collection = FakeCollection()
+        patcher = mock.patch.object(self.vfd, "_current_collection", return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.vfd.clear_query_cache)
+
+    def test_batched_queries_without_metadata(self):
+        async def run():
+            return await asyncio.gather(
+                self.vfd._query_collection("tuition fees", None, n_results=3),
+                self.vfd._query_collection("enrollment steps", None, n_results=3),
+            )
+
+        fees, enrollment = asyncio.run(run())
+
+        self.assertEqual(self.collection.calls, [["tuition fees", "enrollment steps"]])
+        self.assertEqual(fees.docs, [f"tuition fees doc {i}" for i in range(3)])
+        self.assertEqual(enrollment.docs, [f"enrollment steps doc {i}" for i in range(3)])
+        self.assertEqual(enrollment.metas, [{}, {}, {}])
+        self.assertEqual(len(enrollment.dists), 3)
+
+    def test_from_query_without_metadata(self):
+        result = {"documents": [["a", "b"], ["c"]], "metadatas": None, "distances": [[0.1, 0.2], [0.3]]}
+        second = VirtualFrontDesk.ChromaHits.from_query(result, 1)
+        self.assertEqual(second.docs, ["c"])
+        self.assertEqual(second.metas, [{}])
+
+
+if __name__ == "__main__":
+    unittest.main()